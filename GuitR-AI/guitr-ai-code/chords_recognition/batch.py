@@ -0,0 +1,82 @@
+"""Analyze a whole music library for chords, key and tempo, headless.
+
+    python batch.py ~/Music /data/stems --workers 8
+
+Results go into the same cache the GUI reads, so opening any of these
+files later is a cache hit. Each analysis is cached as soon as it
+finishes, so an interrupted run resumes where it left off: fully
+cached tracks are skipped without being decoded.
+"""
+import compat  # must run before madmom is imported
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import CACHE_DIR
+from executor import analyze_track, init_worker
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".aac", ".flac", ".ogg")
+
+
+def find_audio_files(roots, extensions=AUDIO_EXTENSIONS):
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(dirpath, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roots", nargs="+", help="directories (or files) to analyze")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache directory to fill")
+    args = parser.parse_args()
+
+    files = list(find_audio_files(args.roots))
+    print(f"{len(files)} audio files, {args.workers} workers")
+    analyzed = skipped = failed = 0
+    audio_seconds = 0.0
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers, initializer=init_worker, initargs=(args.cache_dir,)
+    )
+    try:
+        futures = {pool.submit(analyze_track, path): path for path in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                result, elapsed = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[{done}/{len(files)}] FAILED {path}: {e}")
+                continue
+            if not result.computed:
+                skipped += 1
+                continue
+            analyzed += 1
+            audio_seconds += result.duration
+            print(f"[{done}/{len(files)}] {path}  {elapsed:.1f} s "
+                  f"({', '.join(result.computed)}; {result.key}, {result.tempo} BPM)")
+    except KeyboardInterrupt:
+        print("Interrupted; finished analyses are cached, rerun to resume.")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(130)
+    pool.shutdown()
+
+    wall = time.perf_counter() - start
+    print(f"Analyzed {analyzed}, already cached {skipped}, failed {failed} in {wall:.1f} s")
+    if analyzed:
+        print(f"Throughput: {60 * analyzed / wall:.1f} tracks/min, "
+              f"real-time factor {wall / audio_seconds:.3f} "
+              f"({audio_seconds / wall:.1f}x faster than real time)")
+
+
+if __name__ == "__main__":
+    main()
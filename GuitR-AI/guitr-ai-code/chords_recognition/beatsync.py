@@ -0,0 +1,77 @@
+"""Align chord segments to a beat grid and group them into bars."""
+import numpy as np
+
+# madmom's beat tracker finds beats, not downbeats, so bars are counted in
+# groups of this many beats from the first tracked beat.
+BEATS_PER_BAR = 4
+
+
+def quantize_chords(chords, beats):
+    """Snap every chord boundary to the nearest beat.
+
+    Segments that collapse to zero length are dropped and neighbours with
+    the same label are merged. Without beats the chords come back unchanged.
+    """
+    beats = np.asarray(beats, dtype=np.float64)
+    if len(beats) < 2 or not len(chords):
+        return list(chords)
+    starts = np.array([start for start, _, _ in chords])
+    ends = np.array([end for _, end, _ in chords])
+
+    def snap(times):
+        right = np.clip(np.searchsorted(beats, times), 1, len(beats) - 1)
+        left = right - 1
+        nearer_left = times - beats[left] <= beats[right] - times
+        return np.where(nearer_left, beats[left], beats[right])
+
+    snapped_starts, snapped_ends = snap(starts), snap(ends)
+    # Keep the very start and end of the song where they were.
+    snapped_starts[0], snapped_ends[-1] = starts[0], ends[-1]
+    quantized = []
+    for start, end, (_, _, label) in zip(snapped_starts, snapped_ends, chords):
+        if end <= start:
+            continue
+        if quantized and quantized[-1][2] == label:
+            quantized[-1] = (quantized[-1][0], float(end), label)
+        elif quantized and start > quantized[-1][1]:
+            quantized.append((quantized[-1][1], float(end), label))
+        else:
+            quantized.append((float(start), float(end), label))
+    return quantized
+
+
+def chords_per_bar(chords, beats, beats_per_bar=BEATS_PER_BAR):
+    """[(bar start, bar end, [chord label at each beat])] over the beat grid."""
+    beats = np.asarray(beats, dtype=np.float64)
+    if not len(beats) or not len(chords):
+        return []
+    starts = np.array([start for start, _, _ in chords])
+    labels = [label for _, _, label in chords]
+    # The chord sounding at each beat is the last one that started by then.
+    index = np.clip(np.searchsorted(starts, beats, side="right") - 1, 0, len(labels) - 1)
+    beat_labels = [labels[i] for i in index]
+    bars = []
+    for first in range(0, len(beats), beats_per_bar):
+        last = min(first + beats_per_bar, len(beats))
+        bar_end = beats[last] if last < len(beats) else float(chords[-1][1])
+        bars.append((float(beats[first]), float(bar_end), beat_labels[first:last]))
+    return bars
+
+
+def bar_index(bars_starts, seconds):
+    """Zero-based bar number at a playback position, -1 before the first beat."""
+    return int(np.searchsorted(bars_starts, seconds, side="right")) - 1
+
+
+def format_bar_chart(bars):
+    """'| C . . . | G . Am . |' style chart, one line per four bars."""
+    cells = []
+    for _, _, labels in bars:
+        shown = []
+        for i, label in enumerate(labels):
+            shown.append(label if i == 0 or label != labels[i - 1] else ".")
+        cells.append(" ".join(shown))
+    lines = []
+    for i in range(0, len(cells), 4):
+        lines.append("| " + " | ".join(cells[i:i + 4]) + " |")
+    return "\n".join(lines)
@@ -0,0 +1,96 @@
+"""Check the float32 chord feature backend against madmom's, and time both.
+
+    python bench_chord_backend.py                      # synthetic 30/120 s tracks
+    python bench_chord_backend.py song.mp3 --repeats 5
+
+For every track it reports the largest feature deviation and how many
+frames get a different chord label after the CRF. It exits non-zero if
+parity fails, so it can gate a change to either backend.
+"""
+import compat  # must run before madmom is imported
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from madmom.features.chords import CNNChordFeatureProcessor, CRFChordRecognitionProcessor
+
+from benchmark import synth_track
+from chordnet import FastChordFeatureProcessor
+from processors import load_signal
+
+# Parity thresholds: relative feature error and share of frames whose label differs.
+MAX_RELATIVE_ERROR = 1e-3
+MAX_LABEL_MISMATCH = 0.005
+
+
+def frame_labels(segments, num_frames, fps=10):
+    labels = np.empty(num_frames, dtype=object)
+    for start, end, label in segments:
+        labels[int(round(start * fps)):int(round(end * fps))] = label
+    return labels
+
+
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def compare(audio_path, stock, fast, crf, repeats):
+    signal = load_signal(audio_path)
+    stock_s, expected = best_time(lambda: stock(signal), repeats)
+    fast_s, actual = best_time(lambda: fast(signal), repeats)
+    scale = max(float(np.abs(expected).max()), 1e-12)
+    relative_error = float(np.abs(actual - expected).max()) / scale
+    expected_labels = frame_labels(crf(expected), len(expected))
+    actual_labels = frame_labels(crf(actual), len(actual))
+    mismatch = float(np.mean(expected_labels != actual_labels))
+    return {
+        "track": os.path.basename(audio_path),
+        "duration_s": len(signal) / signal.sample_rate,
+        "stock_s": stock_s,
+        "fast_s": fast_s,
+        "relative_error": relative_error,
+        "label_mismatch": mismatch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="real audio files to include")
+    parser.add_argument("--lengths", nargs="*", type=float, default=[30, 120],
+                        help="synthetic track lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per backend (best is kept)")
+    args = parser.parse_args()
+
+    stock = CNNChordFeatureProcessor()
+    fast = FastChordFeatureProcessor(stock)
+    crf = CRFChordRecognitionProcessor()
+    failed = False
+    with tempfile.TemporaryDirectory() as synth_dir:
+        tracks = []
+        for seconds in args.lengths:
+            path = os.path.join(synth_dir, f"synthetic_{seconds:g}s.wav")
+            synth_track(path, seconds)
+            tracks.append(path)
+        for audio_path in tracks + list(args.files):
+            row = compare(audio_path, stock, fast, crf, args.repeats)
+            ok = (row["relative_error"] <= MAX_RELATIVE_ERROR
+                  and row["label_mismatch"] <= MAX_LABEL_MISMATCH)
+            failed |= not ok
+            print(f"{row['track']:<28} {row['duration_s']:7.1f} s audio  "
+                  f"madmom {row['stock_s']:6.2f} s  float32 {row['fast_s']:6.2f} s  "
+                  f"speedup {row['stock_s'] / row['fast_s']:5.1f}x  "
+                  f"max rel err {row['relative_error']:.1e}  "
+                  f"labels differ {100 * row['label_mismatch']:.2f}%  {'OK' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
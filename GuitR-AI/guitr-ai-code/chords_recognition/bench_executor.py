@@ -0,0 +1,51 @@
+"""Compare the thread and process analysis backends on a set of audio files.
+
+    python bench_executor.py song1.wav song2.mp3 --pool-size 3
+
+Each mode analyzes every file into a fresh temporary cache, so both modes
+do the full chord, key and tempo work.
+"""
+import compat  # must run before madmom is imported
+import argparse
+import tempfile
+import time
+from concurrent.futures import wait
+
+from executor import AnalysisExecutor
+
+
+def bench(mode, files, pool_size):
+    with tempfile.TemporaryDirectory() as cache_root:
+        # Every file is wanted here, so no job may be cancelled to make room.
+        executor = AnalysisExecutor(mode=mode, max_workers=pool_size, cache_root=cache_root,
+                                    max_pending=0)
+        executor.warm()
+        start = time.perf_counter()
+        jobs = [executor.submit(path) for path in files]
+        for job in jobs:
+            job.start()
+        futures = [future for job in jobs for future in job.futures]
+        wait(futures)
+        elapsed = time.perf_counter() - start
+        executor.shutdown()
+    for future in futures:
+        future.result()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", help="audio files to analyze")
+    parser.add_argument("--pool-size", type=int, default=3, help="workers per pool")
+    parser.add_argument("--modes", nargs="+", default=["thread", "process"])
+    args = parser.parse_args()
+
+    timings = {mode: bench(mode, args.files, args.pool_size) for mode in args.modes}
+    for mode, elapsed in timings.items():
+        print(f"{mode:>8}: {elapsed:8.2f} s  ({elapsed / len(args.files):.2f} s/track)")
+    if "thread" in timings and "process" in timings:
+        print(f" speedup: {timings['thread'] / timings['process']:.2f}x (process vs thread)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Benchmark the chord, key and tempo analyzers headlessly.
+
+    python benchmark.py                                  # synthetic 30/120/300 s tracks
+    python benchmark.py song.mp3 --lengths 60 --output after.json
+    python benchmark.py --compare before.json after.json
+
+Every (track, analyzer) pair runs in a fresh process so model loading and
+peak RSS are attributed to that analyzer alone. Results are written as
+JSON tagged with the current git commit, ready to compare between commits.
+"""
+import compat  # must run before madmom is imported
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+CACHE_HIT_REPEATS = 20
+# analyzer kind -> processors it borrows from the registry
+PROCESSORS = {
+    "chord": ("chord_features", "chord_crf"),
+    "key": ("key",),
+    "tempo": ("beats", "tempo"),
+    "beats": ("beats", "beat_dbn"),
+    "tempo_curve": ("beats", "tempo_comb"),
+    "key_segments": ("key",),
+}
+# Triads (root frequency ratios from A4) cycled every two beats.
+PROGRESSION = [
+    (-9, -5, -2),   # C
+    (-2, 2, 5),     # G
+    (0, 3, 7),      # Am
+    (-4, 0, 3),     # F
+]
+
+
+def synth_track(path, seconds, bpm=120):
+    """Write a mono 16-bit WAV with a repeating triad progression and beat clicks."""
+    beat = 60.0 / bpm
+    chord_samples = int(2 * beat * SAMPLE_RATE)
+    total = int(seconds * SAMPLE_RATE)
+    t = np.arange(chord_samples) / SAMPLE_RATE
+    click = np.zeros(chord_samples)
+    click_len = int(0.02 * SAMPLE_RATE)
+    for start in (0, int(beat * SAMPLE_RATE)):
+        click[start:start + click_len] = np.hanning(2 * click_len)[click_len:] * 0.5
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        written = 0
+        index = 0
+        while written < total:
+            triad = PROGRESSION[index % len(PROGRESSION)]
+            tone = sum(
+                np.sin(2 * np.pi * 440.0 * 2 ** (semitones / 12) * harmonic * t) / harmonic
+                for semitones in triad for harmonic in (1, 2, 3)
+            )
+            block = 0.15 * tone * np.exp(-t / beat) + click
+            block = block[:total - written]
+            f.writeframes((np.clip(block, -1, 1) * 32767).astype("<i2").tobytes())
+            written += len(block)
+            index += 1
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(kind, audio_path, cache_root):
+    """Run in a fresh process: load, analyze, then time cache hits."""
+    from cache import AnalysisCache
+    from engine import ANALYZERS, AnalysisEngine
+    from processors import preload
+
+    start = time.perf_counter()
+    preload(PROCESSORS[kind])
+    load_s = time.perf_counter() - start
+
+    engine = AnalysisEngine(AnalysisCache(cache_root, max_bytes=0))
+    start = time.perf_counter()
+    signal = engine.decode(audio_path)
+    decode_s = time.perf_counter() - start
+    duration = len(signal) / signal.sample_rate
+
+    analyzer, config, _ = ANALYZERS[kind]
+    start = time.perf_counter()
+    value = analyzer(audio_path)
+    wall_s = time.perf_counter() - start
+
+    engine.cache.put(kind, audio_path, config, value)
+    hits = []
+    for _ in range(CACHE_HIT_REPEATS):
+        start = time.perf_counter()
+        engine.cache.get(kind, audio_path, config)
+        hits.append(time.perf_counter() - start)
+
+    return {
+        "track": os.path.basename(audio_path),
+        "analyzer": kind,
+        "duration_s": duration,
+        "load_s": load_s,
+        "decode_s": decode_s,
+        "wall_s": wall_s,
+        "rtf": wall_s / duration,
+        "peak_rss_mb": peak_rss_mb(),
+        "cache_hit_ms": 1000 * float(np.median(hits)),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(tracks, analyzers):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as cache_root:
+        for audio_path in tracks:
+            for kind in analyzers:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    row = pool.submit(measure, kind, audio_path, cache_root).result()
+                results.append(row)
+                rss = f"{row['peak_rss_mb']:.0f} MB" if row["peak_rss_mb"] else "n/a"
+                print(f"{row['track']:<28} {kind:<6} {row['duration_s']:7.1f} s audio  "
+                      f"wall {row['wall_s']:7.2f} s  RTF {row['rtf']:.3f}  "
+                      f"RSS {rss:>8}  hit {row['cache_hit_ms']:.2f} ms")
+    return results
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {(r["track"], r["analyzer"]): r for r in json.load(f)["results"]}
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'track':<28} {'analyzer':<8} {'wall':>16} {'RTF':>8} {'RSS':>10} {'hit':>14}")
+    for row in after["results"]:
+        old = before.get((row["track"], row["analyzer"]))
+        if old is None:
+            continue
+        rss = (f"{row['peak_rss_mb'] - old['peak_rss_mb']:+.0f} MB"
+               if row["peak_rss_mb"] and old["peak_rss_mb"] else "n/a")
+        print(f"{row['track']:<28} {row['analyzer']:<8} "
+              f"{old['wall_s']:6.2f}->{row['wall_s']:6.2f} s "
+              f"{row['wall_s'] / old['wall_s']:7.2f}x {rss:>10} "
+              f"{row['cache_hit_ms'] / old['cache_hit_ms']:13.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="real audio files to include")
+    parser.add_argument("--lengths", nargs="*", type=float, default=[30, 120, 300],
+                        help="synthetic track lengths in seconds")
+    parser.add_argument("--analyzers", nargs="+", default=list(PROCESSORS), choices=list(PROCESSORS))
+    parser.add_argument("--output", default="benchmark.json", help="where to write results")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    with tempfile.TemporaryDirectory() as synth_dir:
+        tracks = []
+        for seconds in args.lengths:
+            path = os.path.join(synth_dir, f"synthetic_{seconds:g}s.wav")
+            synth_track(path, seconds)
+            tracks.append(path)
+        results = run(tracks + list(args.files), args.analyzers)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import io
+import os
+import json
+import atexit
+import time
+import struct
+import hashlib
+import threading
+
+import numpy as np
+
+from cache_manager import STATS_FILE, CacheManager
+from chordfile import decode_chords, encode_chords, read_chords, read_text_chords, write_chords
+from config import CACHE_DIR, CACHE_MAX_BYTES
+from lease import Lease, wait_released
+from store import STORE_FILE, AnalysisStore
+
+INDEX_FILE = "index.json"
+CHUNK_SIZE = 1 << 20
+# Pruning scans the whole cache, so put() only prunes once this much has
+# been written or this many seconds have passed since the last prune.
+PRUNE_AFTER_BYTES = 1 << 20
+PRUNE_INTERVAL = 60.0
+
+
+def file_digest(path):
+    """Hash the raw bytes of an audio file (blake2b, 128 bit)."""
+    hash_object = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hash_object.update(chunk)
+    return hash_object.hexdigest()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read_text(path, parse):
+    with open(path, "r") as f:
+        return parse(f.read().strip())
+
+
+def _encode_text(value):
+    return str(value).encode("utf-8")
+
+
+def _encode_array(value):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(value, dtype=np.float32))
+    return buffer.getvalue()
+
+
+def _decode_array(blob):
+    return np.load(io.BytesIO(blob))
+
+
+# kind -> (encode(value) -> bytes, decode(bytes) -> value)
+CODECS = {
+    "chord": (encode_chords, decode_chords),
+    "key": (_encode_text, lambda blob: blob.decode("utf-8")),
+    "tempo": (_encode_text, lambda blob: int(blob.decode("utf-8"))),
+    "beats": (_encode_array, _decode_array),
+    "tempo_curve": (_encode_array, _decode_array),
+    "key_segments": (encode_chords, decode_chords),  # same (start, end, label) layout
+}
+
+# Before the SQLite store every entry was a file: kind -> (extension, reader(path)).
+FILE_CODECS = {
+    "chord": (".bin", read_chords),
+    "key": (".txt", lambda path: _read_text(path, str)),
+    "tempo": (".txt", lambda path: _read_text(path, int)),
+    "beats": (".npy", lambda path: np.load(path)),
+    "tempo_curve": (".npy", lambda path: np.load(path)),
+    "key_segments": (".bin", read_chords),
+}
+
+
+class AnalysisCache:
+    """Analysis results keyed on the audio content and the processor config.
+
+    Results live in an AnalysisStore (SQLite, WAL) in the cache root. The
+    content digest of every file seen is kept there too, validated by
+    mtime and size, so unchanged files are never hashed twice. Entries
+    left as files by older versions are moved into the store on first hit.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.store = AnalysisStore(os.path.join(root, STORE_FILE))
+        self.manager = CacheManager(root, max_bytes, self.store, kinds=set(CODECS))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._unpruned_bytes = 0
+        self._last_prune = None
+        self._import_json_files()
+
+    def _import_json_files(self):
+        # The digest index and the counters used to be JSON files in the root.
+        index_path = os.path.join(self.root, INDEX_FILE)
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        if index is not None:
+            self.store.remember_digests(
+                (path, mtime_ns, size, digest) for path, (mtime_ns, size, digest) in index.items())
+            _remove_quietly(index_path)
+        stats_path = os.path.join(self.root, STATS_FILE)
+        try:
+            with open(stats_path, "r") as f:
+                counters = json.load(f)
+        except (OSError, ValueError):
+            counters = None
+        if counters is not None:
+            self.store.add_counters(hits=counters.get("hits", 0), misses=counters.get("misses", 0))
+            _remove_quietly(stats_path)
+
+    def digest(self, audio_path):
+        """Content digest of audio_path, re-hashed only when mtime/size changed."""
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        digest = self.store.lookup_digest(path, stat.st_mtime_ns, stat.st_size)
+        if digest is None:
+            digest = file_digest(path)
+            self.store.remember_digests([(path, stat.st_mtime_ns, stat.st_size, digest)])
+        return digest
+
+    def key(self, kind, audio_path, config):
+        hash_object = hashlib.blake2b(digest_size=16)
+        hash_object.update(f"{self.digest(audio_path)}|{kind}|{config}".encode())
+        return hash_object.hexdigest()
+
+    def entry_path(self, kind, key, ext=None):
+        return os.path.join(self.root, kind, key + (ext or FILE_CODECS[kind][0]))
+
+    def _adopt_legacy(self, kind, audio_path, cache_file):
+        # Entries written before content keys were named md5(path).txt; keep
+        # them if they are newer than the audio file, drop them otherwise.
+        legacy_name = hashlib.md5(audio_path.encode()).hexdigest() + ".txt"
+        legacy_file = os.path.join(self.root, kind, legacy_name)
+        if not os.path.exists(legacy_file):
+            return False
+        if os.path.getmtime(legacy_file) >= os.path.getmtime(audio_path):
+            os.replace(legacy_file, cache_file)
+            return True
+        os.remove(legacy_file)
+        return False
+
+    def _migrate_text_chords(self, key):
+        # Chord entries used to be "start,end,label" text; convert on first hit.
+        text_file = self.entry_path("chord", key, ".txt")
+        if not os.path.exists(text_file):
+            return False
+        write_chords(self.entry_path("chord", key), read_text_chords(text_file))
+        os.remove(text_file)
+        return True
+
+    def _find_file(self, kind, audio_path, key):
+        cache_file = self.entry_path(kind, key)
+        if os.path.exists(cache_file):
+            return cache_file
+        if kind == "chord":
+            if self._migrate_text_chords(key):
+                return cache_file
+            if self._adopt_legacy(kind, audio_path, self.entry_path(kind, key, ".txt")):
+                self._migrate_text_chords(key)
+                return cache_file
+            return None
+        if self._adopt_legacy(kind, audio_path, cache_file):
+            return cache_file
+        return None
+
+    def _import_file(self, kind, audio_path, config):
+        """Move a file entry from an older version into the store; its blob or None."""
+        if not os.path.isdir(os.path.join(self.root, kind)):
+            return None
+        cache_file = self._find_file(kind, audio_path, self.key(kind, audio_path, config))
+        if cache_file is None:
+            return None
+        encode, _ = CODECS[kind]
+        try:
+            blob = encode(FILE_CODECS[kind][1](cache_file))
+        except (OSError, ValueError, EOFError, struct.error):
+            return None  # truncated by a crash mid-write; recompute it
+        finally:
+            _remove_quietly(cache_file)
+        self.store.put(self.digest(audio_path), kind, config, blob)
+        return blob
+
+    def contains(self, kind, audio_path, config):
+        return (self.store.contains(self.digest(audio_path), kind, config)
+                or self._import_file(kind, audio_path, config) is not None)
+
+    def get(self, kind, audio_path, config):
+        """Return the cached result or None on a miss."""
+        blob = self.store.get(self.digest(audio_path), kind, config)
+        if blob is None:
+            blob = self._import_file(kind, audio_path, config)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if blob is None:
+            return None
+        _, decode = CODECS[kind]
+        return decode(blob)
+
+    def put(self, kind, audio_path, config, value):
+        encode, _ = CODECS[kind]
+        blob = encode(value)
+        self.store.put(self.digest(audio_path), kind, config, blob)
+        self._maybe_prune(len(blob))
+
+    def _maybe_prune(self, written):
+        with self._lock:
+            self._unpruned_bytes += written
+            now = time.monotonic()
+            if (self._last_prune is not None and self._unpruned_bytes < PRUNE_AFTER_BYTES
+                    and now - self._last_prune < PRUNE_INTERVAL):
+                return
+            self._unpruned_bytes = 0
+            self._last_prune = now
+        self.manager.prune()
+
+    def _lease_path(self, kind, audio_path, config):
+        return self.entry_path(kind, self.key(kind, audio_path, config)) + ".lease"
+
+    def try_lease(self, kind, audio_path, config):
+        """Claim the right to compute an entry; None if another process is on it
+        or it was cached in the meantime."""
+        lease_path = self._lease_path(kind, audio_path, config)
+        os.makedirs(os.path.dirname(lease_path), exist_ok=True)
+        lease = Lease.acquire(lease_path)
+        if lease is not None and self.contains(kind, audio_path, config):
+            lease.release()
+            return None
+        return lease
+
+    def wait_for(self, kind, audio_path, config, token=None):
+        """Wait out another process's lease on an entry and return the entry, or
+        None if that process gave up without caching it."""
+        wait_released(self._lease_path(kind, audio_path, config), token)
+        return self.get(kind, audio_path, config)
+
+    def flush_stats(self):
+        """Add this process's hit/miss counts to the shared totals."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            self.hits = self.misses = 0
+        self.manager.add_counters(hits, misses)
+        self.store.flush_hits()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache shared by the analysis threads."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache()
+            atexit.register(_default_cache.flush_stats)
+        return _default_cache
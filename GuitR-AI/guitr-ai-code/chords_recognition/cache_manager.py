@@ -0,0 +1,207 @@
+"""Inspect, prune and clear the chord/key/tempo analysis cache.
+
+    python cache_manager.py stats
+    python cache_manager.py prune --max-bytes 200M
+    python cache_manager.py clear
+    python cache_manager.py --pcm stats     # the decoded PCM cache instead
+"""
+import os
+import heapq
+import shutil
+import argparse
+
+from config import CACHE_DIR, CACHE_MAX_BYTES, PCM_CACHE_DIR, PCM_CACHE_MAX_BYTES, parse_size
+from store import STORE_FILE, AnalysisStore
+
+# Hit/miss counters used to live in this file; they are in the store now.
+STATS_FILE = "stats.json"
+# Files in the cache root that belong to the cache itself, not to entries.
+# The store is emptied in place rather than deleted, as other processes may
+# have it open.
+META_FILES = {"index.json", STATS_FILE, "playing"}
+# The store's database files hold entries but are never entries themselves.
+STORE_FILES = {STORE_FILE, STORE_FILE + "-wal", STORE_FILE + "-shm"}
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _file_entry(path, kind):
+    if os.path.basename(path).endswith((".tmp", ".lease", ".break", ".stale")):
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (path, kind, stat.st_size, stat.st_mtime)
+
+
+class CacheManager:
+    """Size accounting and LRU eviction for a cache directory.
+
+    Covers the results in store, if given, and the files under the root:
+    entries not yet moved into the store, or the .npy files of the PCM
+    cache. kinds limits the subdirectories that are accounted for, so the
+    analysis cache leaves the PCM cache (its own manager and budget) alone
+    even when that lives inside its root. Each entry's last-hit time is
+    refreshed whenever the cache serves it, and eviction removes the least
+    recently hit first.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, store=None, kinds=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.store = store
+        self.kinds = kinds
+
+    def _owns(self, name):
+        return self.kinds is None or name in self.kinds
+
+    def file_entries(self):
+        """(path, kind, size, last_hit) for every entry kept as a file: files in
+        kind subdirectories, and loose files in the root (kind: its name)."""
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                if not self._owns(name):
+                    continue
+                entries = (_file_entry(os.path.join(path, entry), name) for entry in os.listdir(path))
+                found.extend(entry for entry in entries if entry is not None)
+            elif name not in META_FILES and name not in STORE_FILES:
+                entry = _file_entry(path, os.path.basename(os.path.abspath(self.root)))
+                if entry is not None:
+                    found.append(entry)
+        return found
+
+    def entries(self):
+        """(ref, kind, size, last_hit) for every cached result. ref is a file
+        path or a (digest, kind, config) key in the store."""
+        return self.file_entries() + (self.store.entries() if self.store is not None else [])
+
+    def read_counters(self):
+        counters = self.store.counters() if self.store is not None else {}
+        return {"hits": counters.get("hits", 0), "misses": counters.get("misses", 0)}
+
+    def add_counters(self, hits, misses):
+        """Fold one process's hit/miss counts into the shared totals."""
+        if (not hits and not misses) or self.store is None:
+            return
+        self.store.add_counters(hits=hits, misses=misses)
+
+    def stats(self):
+        kinds = dict(self.store.kind_totals()) if self.store is not None else {}
+        for _, kind, size, _ in self.file_entries():
+            count, total = kinds.get(kind, (0, 0))
+            kinds[kind] = (count + 1, total + size)
+        counters = self.read_counters()
+        return {
+            "entries": sum(count for count, _ in kinds.values()),
+            "bytes": sum(total for _, total in kinds.values()),
+            "max_bytes": self.max_bytes,
+            "kinds": {kind: {"entries": c, "bytes": b} for kind, (c, b) in sorted(kinds.items())},
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+        }
+
+    def prune(self, max_bytes=None):
+        """Evict least recently hit entries until the cache fits the budget.
+
+        Returns (entries removed, bytes freed). A budget of 0 means unlimited.
+        """
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        if not budget:
+            return 0, 0
+        files = self.file_entries()
+        total = sum(size for _, _, size, _ in files)
+        oldest = [sorted(files, key=lambda entry: entry[3])]
+        if self.store is not None:
+            # Queued hits must land first or just-used entries look stale.
+            self.store.flush_hits()
+            total += self.store.total_size()
+            oldest.append(self.store.oldest_first())
+        if total <= budget:
+            return 0, 0
+        evicted_keys = []
+        removed = freed = 0
+        # Rows stream off the last-hit index; only what gets evicted is read.
+        for ref, _, size, _ in heapq.merge(*oldest, key=lambda entry: entry[3]):
+            if total <= budget:
+                break
+            if isinstance(ref, tuple):
+                evicted_keys.append(ref)
+            else:
+                try:
+                    os.remove(ref)
+                except OSError:
+                    # Still memory-mapped by a reader on Windows; try next time.
+                    continue
+            total -= size
+            removed += 1
+            freed += size
+        for source in oldest[1:]:
+            source.close()            # finish the SELECT before deleting
+        if evicted_keys:
+            self.store.delete(evicted_keys)
+        return removed, freed
+
+    def clear(self):
+        """Remove every entry, the path index and the counters."""
+        removed = len(self.entries())
+        if self.store is not None:
+            self.store.clear()
+        if os.path.isdir(self.root):
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if os.path.isdir(path):
+                    if self._owns(name):
+                        shutil.rmtree(path, ignore_errors=True)
+                elif name not in STORE_FILES:
+                    os.remove(path)
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=None, help="cache directory")
+    parser.add_argument("--pcm", action="store_true",
+                        help="manage the decoded PCM cache (GUITR_PCM_CACHE_DIR) instead")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="show entries, size and hit/miss counts")
+    prune_parser = commands.add_parser("prune", help="evict least recently used entries")
+    prune_parser.add_argument("--max-bytes", type=parse_size, default=None,
+                              help="budget to prune down to (default: GUITR_CACHE_MAX_BYTES, "
+                                   "or GUITR_PCM_CACHE_MAX_BYTES with --pcm)")
+    commands.add_parser("clear", help="delete the whole cache")
+    args = parser.parse_args()
+
+    if args.pcm:
+        manager = CacheManager(args.root or PCM_CACHE_DIR, PCM_CACHE_MAX_BYTES)
+    else:
+        from cache import CODECS
+        root = args.root or CACHE_DIR
+        manager = CacheManager(root, store=AnalysisStore(os.path.join(root, STORE_FILE)), kinds=set(CODECS))
+    if args.command == "stats":
+        stats = manager.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = f"{100 * stats['hits'] / lookups:.1f}%" if lookups else "n/a"
+        budget = format_size(stats["max_bytes"]) if stats["max_bytes"] else "unlimited"
+        print(f"{stats['entries']} entries, {format_size(stats['bytes'])} (budget {budget})")
+        for kind, kind_stats in stats["kinds"].items():
+            print(f"  {kind:<8} {kind_stats['entries']:>6} entries  {format_size(kind_stats['bytes']):>10}")
+        print(f"hits {stats['hits']}, misses {stats['misses']}, hit rate {hit_rate}")
+    elif args.command == "prune":
+        removed, freed = manager.prune(args.max_bytes)
+        print(f"Removed {removed} entries, freed {format_size(freed)}")
+    else:
+        print(f"Removed {manager.clear()} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import threading
+
+
+class Cancelled(Exception):
+    """Raised at the next stage boundary of a job whose token was cancelled."""
+
+
+class CancelToken:
+    """Shared flag between whoever schedules a job and the code running it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def guard(slot, token):
+    """Wrap a Qt slot so it ignores emits once token is cancelled.
+
+    Cross-thread emits are queued, so a job cancelled by the GUI thread can
+    still have results waiting in the event loop; the check runs when they
+    are delivered, after the cancel.
+    """
+    def guarded(*args):
+        if not token.cancelled:
+            slot(*args)
+    return guarded
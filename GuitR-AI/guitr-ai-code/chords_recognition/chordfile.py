@@ -0,0 +1,105 @@
+"""Binary chord segment files.
+
+Layout (little-endian):
+    header   b"GCHD", uint16 version, 2 pad bytes, uint32 segments, uint32 label bytes
+    labels   UTF-8 label table joined with "\\n", padded to a 4-byte boundary
+    starts   float32[segments]
+    ends     float32[segments]
+    ids      int16[segments], indices into the label table
+
+Segments are read as views into the file or blob, so a cache hit costs no
+parsing at all.
+"""
+import struct
+from collections.abc import Sequence
+
+import numpy as np
+
+MAGIC = b"GCHD"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxII")
+
+
+class ChordSegments(Sequence):
+    """Read-only list of (start, end, label) tuples backed by NumPy arrays."""
+
+    def __init__(self, starts, ends, label_ids, labels):
+        self.starts = starts
+        self.ends = ends
+        self.label_ids = label_ids
+        self.labels = labels
+
+    @classmethod
+    def from_tuples(cls, chords):
+        labels = sorted({label for _, _, label in chords})
+        label_index = {label: i for i, label in enumerate(labels)}
+        return cls(
+            np.array([start for start, _, _ in chords], dtype=np.float32),
+            np.array([end for _, end, _ in chords], dtype=np.float32),
+            np.array([label_index[label] for _, _, label in chords], dtype=np.int16),
+            labels,
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return (float(self.starts[index]), float(self.ends[index]),
+                self.labels[self.label_ids[index]])
+
+
+def _padded(size):
+    return (size + 3) & ~3
+
+
+def encode_chords(chords):
+    """Chord segments as bytes in the layout above."""
+    if not isinstance(chords, ChordSegments):
+        chords = ChordSegments.from_tuples(chords)
+    label_table = "\n".join(chords.labels).encode("utf-8")
+    return b"".join((
+        HEADER.pack(MAGIC, VERSION, len(chords), len(label_table)),
+        label_table.ljust(_padded(len(label_table)), b"\0"),
+        np.asarray(chords.starts, dtype="<f4").tobytes(),
+        np.asarray(chords.ends, dtype="<f4").tobytes(),
+        np.asarray(chords.label_ids, dtype="<i2").tobytes(),
+    ))
+
+
+def decode_chords(buffer):
+    """ChordSegments viewing a buffer in the layout above, without copying it."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    magic, version, count, label_bytes = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a chord segment file")
+    offset = HEADER.size
+    label_table = bytes(data[offset:offset + label_bytes]).decode("utf-8")
+    labels = label_table.split("\n") if label_bytes else []
+    offset += _padded(label_bytes)
+    starts = data[offset:offset + 4 * count].view("<f4")
+    offset += 4 * count
+    ends = data[offset:offset + 4 * count].view("<f4")
+    offset += 4 * count
+    label_ids = data[offset:offset + 2 * count].view("<i2")
+    return ChordSegments(starts, ends, label_ids, labels)
+
+
+def write_chords(path, chords):
+    with open(path, "wb") as f:
+        f.write(encode_chords(chords))
+
+
+def read_chords(path):
+    return decode_chords(np.memmap(path, dtype=np.uint8, mode="r"))
+
+
+def read_text_chords(path):
+    """Parse the old "start,end,label" per line cache format."""
+    with open(path, "r") as f:
+        return [
+            (float(start), float(end), label)
+            for line in f
+            for start, end, label in [line.strip().split(",")]
+        ]
@@ -0,0 +1,125 @@
+"""Batched float32 inference for madmom's chord feature CNN.
+
+madmom evaluates each convolution as one 2D convolution per pair of input
+and output channels. This backend loads the same weights and computes
+every layer for the whole track at once: a convolution becomes one float32
+matrix product per kernel offset, which multithreaded BLAS handles well.
+Check parity and speed with bench_chord_backend.py.
+"""
+import numpy as np
+from madmom.audio.signal import FramedSignalProcessor, SignalProcessor
+from madmom.audio.spectrogram import LogarithmicFilteredSpectrogramProcessor
+from madmom.audio.stft import ShortTimeFourierTransformProcessor
+from madmom.features.chords import CNNChordFeatureProcessor
+from madmom.ml.nn import NeuralNetwork
+from madmom.ml.nn.layers import BatchNormLayer, ConvolutionalLayer, MaxPoolLayer
+
+
+class _Conv:
+    def __init__(self, layer):
+        if layer.pad != "valid":
+            raise ValueError(f"unsupported convolution padding {layer.pad!r}")
+        # madmom convolves (flips the kernel); correlating with a flipped copy is the same.
+        weights = np.asarray(layer.weights, dtype=np.float32)[:, :, ::-1, ::-1]
+        self.kernel = np.ascontiguousarray(weights.transpose(2, 3, 0, 1))  # (time, freq, in, out)
+        self.bias = np.asarray(layer.bias, dtype=np.float32)
+        self.activation_fn = layer.activation_fn
+
+    def __call__(self, data):
+        size_time, size_freq = self.kernel.shape[:2]
+        frames = data.shape[0] - size_time + 1
+        bins = data.shape[1] - size_freq + 1
+        out = np.zeros((frames, bins, self.kernel.shape[3]), dtype=np.float32)
+        for i in range(size_time):
+            for j in range(size_freq):
+                out += np.tensordot(data[i:i + frames, j:j + bins], self.kernel[i, j], axes=1)
+        out += self.bias
+        return self.activation_fn(out)
+
+
+class _BatchNorm:
+    def __init__(self, layer):
+        scale = np.asarray(layer.gamma * layer.inv_std, dtype=np.float32)
+        self.scale = scale
+        self.shift = np.asarray(layer.beta - layer.mean * scale, dtype=np.float32)
+        self.activation_fn = layer.activation_fn
+
+    def __call__(self, data):
+        data *= self.scale
+        data += self.shift
+        return self.activation_fn(data)
+
+
+class _MaxPool:
+    def __init__(self, layer):
+        if tuple(layer.size) != tuple(layer.stride):
+            raise ValueError("only non-overlapping max pooling is supported")
+        self.size = tuple(layer.size)
+
+    def __call__(self, data):
+        # Same windows as madmom's maximum_filter + strided slice when size == stride.
+        st, sf = self.size
+        frames, bins = data.shape[0] // st, data.shape[1] // sf
+        data = data[:frames * st, :bins * sf]
+        return data.reshape(frames, st, bins, sf, data.shape[2]).max(axis=(1, 3))
+
+
+_LAYERS = {ConvolutionalLayer: _Conv, BatchNormLayer: _BatchNorm, MaxPoolLayer: _MaxPool}
+
+# What CNNChordFeatureProcessor is built from; anything else is a madmom
+# version this backend was not written against.
+_FRONTEND = (SignalProcessor, FramedSignalProcessor, ShortTimeFourierTransformProcessor,
+             LogarithmicFilteredSpectrogramProcessor)
+_SUPERFRAME = 3
+
+
+def _superframe_mean(data):
+    """madmom's superframes + average: mean over 3 frames and all bins."""
+    per_frame = data.mean(axis=1)
+    return (per_frame[:-2] + per_frame[1:-1] + per_frame[2:]) / np.float32(_SUPERFRAME)
+
+
+def _check_layout(stock):
+    """Raise ValueError unless stock is the processor chain this backend replaces."""
+    processors = stock.processors
+    if len(processors) != 8:
+        raise ValueError(f"expected 8 chord feature processors, found {len(processors)}")
+    for processor, expected in zip(processors, _FRONTEND):
+        if not isinstance(processor, expected):
+            raise ValueError(f"expected {expected.__name__}, found {type(processor).__name__}")
+    if not callable(processors[4]):
+        raise ValueError("expected the spectrogram padding step before the network")
+    if not isinstance(processors[5], NeuralNetwork):
+        raise ValueError(f"expected a NeuralNetwork, found {type(processors[5]).__name__}")
+    # The last two steps are plain functions; check they compute what we replace them with.
+    probe = np.random.default_rng(0).standard_normal((2 * _SUPERFRAME + 1, 4, 3)).astype(np.float32)
+    expected = processors[7](processors[6](probe))
+    if np.shape(expected) != (len(probe) - _SUPERFRAME + 1, probe.shape[2]) or \
+            not np.allclose(expected, _superframe_mean(probe), atol=1e-6):
+        raise ValueError("madmom's superframe averaging no longer matches this backend")
+
+
+class FastChordFeatureProcessor:
+    """Drop-in for CNNChordFeatureProcessor: same spectrogram, same weights, float32 batched CNN."""
+
+    def __init__(self, stock=None):
+        stock = stock or CNNChordFeatureProcessor()
+        _check_layout(stock)
+        # sig, frames, stft, spec, pad | nn | superframes, avg
+        self.frontend = stock.processors[:5]
+        self.layers = []
+        for layer in stock.processors[5].layers:
+            if type(layer) not in _LAYERS:
+                raise ValueError(f"unsupported layer {type(layer).__name__}")
+            self.layers.append(_LAYERS[type(layer)](layer))
+
+    def __call__(self, data):
+        return self.process(data)
+
+    def process(self, data):
+        for step in self.frontend:
+            data = step(data)
+        data = np.asarray(data, dtype=np.float32)[:, :, np.newaxis]
+        for layer in self.layers:
+            data = layer(data)
+        return _superframe_mean(data)
@@ -1,45 +1,76 @@
-import os
-import hashlib
+import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
-import madmom
+
+from cache import default_cache
+from chordfile import ChordSegments
+from config import CHORD_BACKEND
+from processors import load_signal, use_processor
+from timing import NULL_TIMER, new_timer
+
+# Part of the cache key: bump it whenever the chord pipeline changes. The
+# float32 backend can differ from madmom in the last bits, so it gets its own.
+CHORD_CONFIG = "madmom-cnn-crf:v1" if CHORD_BACKEND == "madmom" else f"madmom-cnn-crf:{CHORD_BACKEND}:v1"
+
+def format_chord_label(chord_label):
+    if ":maj" in chord_label:
+        return chord_label.replace(":maj", "")
+    if ":min" in chord_label:
+        return chord_label.replace(":min", "m")
+    return chord_label
+
+def chord_bounds(chords):
+    """(starts, ends) of a chord list as float64 arrays, for chord_at lookups."""
+    if isinstance(chords, ChordSegments):
+        return (np.asarray(chords.starts, dtype=np.float64),
+                np.asarray(chords.ends, dtype=np.float64))
+    return (np.array([start for start, _, _ in chords], dtype=np.float64),
+            np.array([end for _, end, _ in chords], dtype=np.float64))
+
+def chord_at(chord_ends, seconds):
+    """Index of the chord sounding at seconds: the first one ending after it,
+    len(chord_ends) once the last chord is over."""
+    return int(np.searchsorted(chord_ends, seconds, side="right"))
+
+def recognize_chords(audio, timer=NULL_TIMER):
+    """Chord segments (start, end, label) for a file path or a decoded Signal."""
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    with timer.stage("cnn_features"), use_processor("chord_features") as feat_processor:
+        feats = feat_processor(signal)
+    with timer.stage("crf_decode"), use_processor("chord_crf") as recog_processor:
+        chords = recog_processor(feats)
+    return [
+        (float(start_time), float(end_time), format_chord_label(chord_label))
+        for start_time, end_time, chord_label in chords
+    ]
 
 class ChordRecognitionThread(QThread):
-    result = pyqtSignal(list)
+    result = pyqtSignal(object)
+    timings = pyqtSignal(dict)
 
     def __init__(self, audio_path):
         super().__init__()
         self.audio_path = audio_path
 
     def run(self):
-        cache_dir = "cache/chord/"
-        os.makedirs(cache_dir, exist_ok=True)
-        hash_object = hashlib.md5(self.audio_path.encode())
-        hashed_filename = hash_object.hexdigest() + ".txt"
-        cache_file = os.path.join(cache_dir, hashed_filename)
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                cached_chords = [
-                    (float(start), float(end), label)
-                    for line in f
-                    for start, end, label in [line.strip().split(",")]
-                ]
+        cache = default_cache()
+        timer = new_timer("chord", self.audio_path)
+        with timer.stage("cache_lookup"):
+            cached_chords = cache.get("chord", self.audio_path, CHORD_CONFIG)
+        if cached_chords is not None:
             self.result.emit(cached_chords)
+            self.report(timer)
             self.quit()
             return
 
-        feat_processor = madmom.features.chords.CNNChordFeatureProcessor()
-        recog_processor = madmom.features.chords.CRFChordRecognitionProcessor()
-        feats = feat_processor(self.audio_path)
-        chords = recog_processor(feats)
-        formatted_chords = []
-        with open(cache_file, "w") as f:
-            for chord in chords:
-                start_time, end_time, chord_label = chord
-                if ":maj" in chord_label:
-                    chord_label = chord_label.replace(":maj", "")
-                elif ":min" in chord_label:
-                    chord_label = chord_label.replace(":min", "m")
-                formatted_chords.append((start_time, end_time, chord_label))
-                f.write(f"{start_time},{end_time},{chord_label}\n")
+        formatted_chords = recognize_chords(self.audio_path, timer)
+        with timer.stage("cache_write"):
+            cache.put("chord", self.audio_path, CHORD_CONFIG, formatted_chords)
         self.result.emit(formatted_chords)
+        self.report(timer)
         self.quit()
+
+    def report(self, timer):
+        if timer.stages:
+            timer.log()
+            self.timings.emit({"chord": timer.stages})
@@ -0,0 +1,19 @@
+# Compatibility patches madmom needs on newer Python and NumPy.
+# Import this before madmom in every entry point (GUI, workers, scripts).
+
+# === Monkey Patch for Python 3.11 Compatibility ===
+import collections
+try:
+    collections.MutableSequence
+except AttributeError:
+    import collections.abc
+    collections.MutableSequence = collections.abc.MutableSequence
+# ================================================
+
+# --- Monkey Patch for NumPy deprecation of np.int and np.float ---
+import numpy as np
+if not hasattr(np, 'int'):
+    np.int = int
+if not hasattr(np, 'float'):
+    np.float = float
+# -----------------------------------------------------
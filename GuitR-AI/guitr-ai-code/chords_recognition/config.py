@@ -0,0 +1,72 @@
+# Runtime settings for the chord recognition app.
+# Every value can be overridden with a GUITR_* environment variable.
+import os
+
+
+def parse_size(text):
+    """'1048576', '512K', '200M' or '2G' -> bytes."""
+    text = text.strip().upper()
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+# Root folder for the chord/key/tempo analysis cache.
+CACHE_DIR = os.environ.get("GUITR_CACHE_DIR", "cache")
+
+# Where analysis runs: "thread" (one process, single decode per file) or
+# "process" (a pool of warm worker processes, one job per analysis).
+ANALYSIS_BACKEND = os.environ.get("GUITR_ANALYSIS_BACKEND", "thread")
+
+# Number of worker threads/processes in the analysis pool.
+POOL_SIZE = int(os.environ.get("GUITR_POOL_SIZE", "3"))
+
+# Size budget for the analysis cache; least recently hit entries are evicted
+# beyond it. Accepts plain bytes or a K/M/G suffix, 0 means unlimited.
+CACHE_MAX_BYTES = parse_size(os.environ.get("GUITR_CACHE_MAX_BYTES", "512M"))
+
+# Input device for live chord recognition: an index or part of a device
+# name; unset means the system default input.
+LIVE_INPUT_DEVICE = os.environ.get("GUITR_LIVE_DEVICE") or None
+if LIVE_INPUT_DEVICE is not None and LIVE_INPUT_DEVICE.isdigit():
+    LIVE_INPUT_DEVICE = int(LIVE_INPUT_DEVICE)
+
+# End-to-end latency budget for live mode, in milliseconds.
+LIVE_LATENCY_TARGET_MS = float(os.environ.get("GUITR_LIVE_LATENCY_MS", "300"))
+
+# Per-stage timing of the analyses (decode, CNN, CRF, ...), reported through
+# Qt signals and the "guitr.timing" logger. Off by default.
+TIMING_ENABLED = os.environ.get("GUITR_TIMING", "0") == "1"
+
+# Folders the background prefetcher watches for new audio, separated by
+# os.pathsep (":" on Linux/macOS, ";" on Windows). Unset disables it.
+WATCH_DIRS = [path for path in os.environ.get("GUITR_WATCH_DIRS", "").split(os.pathsep) if path]
+
+# Seconds between rescans of the watched folders.
+PREFETCH_INTERVAL = float(os.environ.get("GUITR_PREFETCH_INTERVAL", "30"))
+
+# Analysis jobs the executor keeps queued or running at once; submitting
+# beyond this cancels the oldest.
+MAX_PENDING_JOBS = int(os.environ.get("GUITR_MAX_PENDING_JOBS", "2"))
+
+# Keep decoded mono float32 PCM as memory-mapped .npy files so re-analysis,
+# retraining and separation reruns skip decoding ("1") or not ("0"). Shared
+# with track_separation/data_prep.py: point GUITR_CACHE_DIR (or
+# GUITR_PCM_CACHE_DIR) at an absolute path to share it across working dirs.
+PCM_CACHE_ENABLED = os.environ.get("GUITR_PCM_CACHE", "0") == "1"
+PCM_CACHE_DIR = os.environ.get("GUITR_PCM_CACHE_DIR") or os.path.join(CACHE_DIR, "pcm")
+# Size budget for the PCM cache, kept apart from GUITR_CACHE_MAX_BYTES: one
+# decoded track weighs as much as thousands of analysis results.
+PCM_CACHE_MAX_BYTES = parse_size(os.environ.get("GUITR_PCM_CACHE_MAX_BYTES", "2G"))
+
+# Stream chord results block by block so playback starts before the whole
+# file is analyzed ("1") or wait for the complete analysis ("0"). The
+# streaming thread runs next to the executor job for key, tempo and beats;
+# both get their samples through the PCM cache, so with it on the file is
+# decoded once, and with it off twice. Hence the default follows the PCM cache.
+STREAM_CHORDS = os.environ.get("GUITR_STREAM_CHORDS", "1" if PCM_CACHE_ENABLED else "0") == "1"
+
+# Chord feature CNN implementation: "madmom" (the stock processor) or
+# "float32" (chordnet.py: same weights, batched float32 BLAS inference).
+CHORD_BACKEND = os.environ.get("GUITR_CHORD_BACKEND", "madmom")
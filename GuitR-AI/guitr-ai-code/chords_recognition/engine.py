@@ -0,0 +1,168 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from cache import default_cache
+from cancellation import Cancelled
+from chords import CHORD_CONFIG, recognize_chords
+from key import KEY_CONFIG, KEY_SEGMENTS_CONFIG, recognize_key, recognize_key_segments
+from processors import load_signal
+from tempo import (BEATS_CONFIG, CURVE_CONFIG, TEMPO_CONFIG, detect_tempo, tempo_curve,
+                   track_beats)
+from timing import NULL_TIMER, new_timer
+
+# kind -> (analyzer, cache config, value emitted when the analyzer finds nothing)
+ANALYZERS = {
+    "chord": (recognize_chords, CHORD_CONFIG, []),
+    "key": (recognize_key, KEY_CONFIG, "Error"),
+    "tempo": (detect_tempo, TEMPO_CONFIG, 0),
+    "beats": (track_beats, BEATS_CONFIG, np.zeros(0, dtype=np.float32)),
+    "tempo_curve": (tempo_curve, CURVE_CONFIG, np.zeros((0, 2), dtype=np.float32)),
+    "key_segments": (recognize_key_segments, KEY_SEGMENTS_CONFIG, []),
+}
+# Analyses that share a network pass over the same decode (tempo, the beat
+# grid and the tempo curve read the beat RNN activations, the key and its
+# segments the key CNN's logits); never split them across workers.
+SHARED_PASSES = (("tempo", "beats", "tempo_curve"), ("key", "key_segments"))
+
+
+def group_kinds(kinds):
+    """Split kinds into groups that must run off the same decode."""
+    groups = []
+    remaining = list(kinds)
+    for shared in SHARED_PASSES:
+        group = tuple(kind for kind in remaining if kind in shared)
+        if group:
+            groups.append(group)
+            remaining = [kind for kind in remaining if kind not in shared]
+    groups.extend((kind,) for kind in remaining)
+    return groups
+
+
+@dataclass
+class AnalysisResult:
+    chords: list = field(default_factory=list)
+    key: str = ""
+    tempo: int = 0
+    beats: object = field(default_factory=list)  # beat times in seconds
+    tempo_curve: object = None                   # rows of (seconds, BPM)
+    key_segments: list = field(default_factory=list)
+    # Seconds of audio decoded (0 when every result came from the cache)
+    # and the analyses that had to be computed.
+    duration: float = 0.0
+    computed: list = field(default_factory=list)
+    # kind -> {stage: seconds} when timing is enabled; the shared decode is
+    # reported under "engine".
+    timings: dict = field(default_factory=dict)
+
+    def set(self, kind, value):
+        setattr(self, "chords" if kind == "chord" else kind, value)
+
+
+class AnalysisEngine:
+    """Runs chord, key, tempo and beat analysis off a single decode of the audio."""
+
+    def __init__(self, cache=None):
+        self.cache = cache or default_cache()
+
+    def decode(self, audio_path):
+        return load_signal(audio_path)
+
+    def run_analyzer(self, kind, audio_path, signal=None, timer=NULL_TIMER):
+        """Compute one analysis (decoding if no signal is given) and cache it."""
+        analyzer, config, fallback = ANALYZERS[kind]
+        if signal is None:
+            with timer.stage("decode"):
+                signal = self.decode(audio_path)
+        try:
+            value = analyzer(signal, timer)
+        except Cancelled:
+            raise
+        except Exception:
+            if kind not in ("key", "key_segments"):
+                raise
+            value = None
+        if value is None:
+            return fallback
+        with timer.stage("cache_write"):
+            self.cache.put(kind, audio_path, config, value)
+        return value
+
+    def analyze_one(self, kind, audio_path, timer=NULL_TIMER):
+        with timer.stage("cache_lookup"):
+            cached = self.cache.get(kind, audio_path, ANALYZERS[kind][1])
+        if cached is not None:
+            return cached
+        return self.run_analyzer(kind, audio_path, timer=timer)
+
+    def analyze(self, audio_path, callback=None, kinds=None, result=None, token=None):
+        """Analyze audio_path, calling callback(kind, value) as each result lands.
+
+        kinds restricts the run to some of the analyses (default: all of them);
+        result is an AnalysisResult to fill in instead of a new one. Once token
+        is cancelled, the next stage boundary raises Cancelled.
+        """
+        result = result if result is not None else AnalysisResult()
+        timers = {kind: new_timer(kind, audio_path, token) for kind in kinds or ANALYZERS}
+
+        def finish(kind, value):
+            result.set(kind, value)
+            if timers[kind].stages:
+                timers[kind].log()
+                result.timings[kind] = timers[kind].stages
+            if callback is not None:
+                callback(kind, value)
+
+        pending = []
+        for kind, timer in timers.items():
+            with timer.stage("cache_lookup"):
+                cached = self.cache.get(kind, audio_path, ANALYZERS[kind][1])
+            if cached is None:
+                pending.append(kind)
+            else:
+                finish(kind, cached)
+        if not pending:
+            return result
+
+        # A second GUI, the batch tool or the prefetcher may already be
+        # computing some of these; claim the rest and wait for theirs.
+        leases = {}
+        for kind in pending:
+            lease = self.cache.try_lease(kind, audio_path, ANALYZERS[kind][1])
+            if lease is not None:
+                leases[kind] = lease
+        try:
+            if leases:
+                self._compute(audio_path, list(leases), timers, result, finish, token)
+        finally:
+            for lease in leases.values():
+                lease.release()
+        for kind in pending:
+            if kind in leases:
+                continue
+            with timers[kind].stage("lease_wait"):
+                value = self.cache.wait_for(kind, audio_path, ANALYZERS[kind][1], token)
+            if value is None:
+                # The other process gave up without a result; do it ourselves.
+                self._compute(audio_path, [kind], timers, result, finish, token)
+            else:
+                finish(kind, value)
+        return result
+
+    def _compute(self, audio_path, kinds, timers, result, finish, token):
+        decode_timer = new_timer("engine", audio_path, token)
+        with decode_timer.stage("decode"):
+            signal = self.decode(audio_path)
+        if decode_timer.stages:
+            decode_timer.log()
+            result.timings["engine"] = decode_timer.stages
+        result.duration = len(signal) / signal.sample_rate
+        result.computed.extend(kinds)
+        with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+            futures = {
+                pool.submit(self.run_analyzer, kind, audio_path, signal, timers[kind]): kind
+                for kind in kinds
+            }
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
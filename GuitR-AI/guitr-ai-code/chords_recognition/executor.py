@@ -0,0 +1,209 @@
+import compat  # workers import this module first, so patch before madmom loads
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from cache import AnalysisCache, default_cache
+from cancellation import CancelToken, Cancelled
+from config import ANALYSIS_BACKEND, CACHE_DIR, MAX_PENDING_JOBS, POOL_SIZE
+from engine import ANALYZERS, AnalysisEngine, AnalysisResult, group_kinds
+from processors import preload
+import timing
+
+# One engine per worker process, created by the pool initializer.
+_worker_engine = None
+
+
+def init_worker(cache_root=CACHE_DIR):
+    global _worker_engine
+    _worker_engine = AnalysisEngine(AnalysisCache(cache_root))
+    preload()
+
+
+def ping():
+    return True
+
+
+def run_analysis(kinds, audio_path, timed=False):
+    """Process-pool entry point: some analyses of one file, through the cache.
+
+    kinds is one group from group_kinds, so analyses sharing a network pass
+    run off one decode. Returns ({kind: value}, {kind: {stage: seconds}});
+    the timings are empty unless timed.
+    """
+    timing.enabled = timed
+    values = {}
+    try:
+        result = _worker_engine.analyze(audio_path, values.__setitem__, kinds)
+    finally:
+        # Pool workers exit through os._exit, where atexit never runs.
+        _worker_engine.cache.flush_stats()
+    return values, result.timings
+
+
+def analyze_track(audio_path):
+    """Process-pool entry point: every analysis of one file off a single decode."""
+    start = time.perf_counter()
+    try:
+        result = _worker_engine.analyze(audio_path)
+    finally:
+        _worker_engine.cache.flush_stats()
+    return result, time.perf_counter() - start
+
+
+class AnalysisJob(QObject):
+    """Qt face of one submitted file; signals fire as each analysis finishes.
+
+    A job is created unstarted: connect its signals, then call start(), so
+    not even an instant cache hit can emit before anyone is listening.
+    """
+    chords = pyqtSignal(object)
+    key = pyqtSignal(str)
+    tempo = pyqtSignal(int)
+    beats = pyqtSignal(object)
+    tempo_curve = pyqtSignal(object)
+    key_segments = pyqtSignal(object)
+    result = pyqtSignal(object)
+    timings = pyqtSignal(dict)
+    error = pyqtSignal(str)
+
+    def __init__(self, audio_path, kinds, launch):
+        super().__init__()
+        self.audio_path = audio_path
+        self.futures = []
+        self.started = False
+        self._launch = launch
+        self.token = CancelToken()
+        self.analysis = AnalysisResult()
+        self._remaining = len(kinds)
+
+    def cancel(self):
+        """Stop the job at its next stage boundary and drop jobs not yet started.
+
+        Work already running in a worker process can't be interrupted; it
+        still fills the cache, but nothing more is emitted for this job.
+        """
+        self.token.cancel()
+        for future in self.futures:
+            future.cancel()
+
+    def start(self):
+        """Hand the job to the pool; a no-op if it was started or cancelled already."""
+        if self.started or self.token.cancelled:
+            return
+        self.started = True
+        self.futures.extend(self._launch(self))
+
+    def done(self):
+        return self.started and all(future.done() for future in self.futures)
+
+    def deliver(self, kind, value):
+        if self.token.cancelled:
+            return
+        self.analysis.set(kind, value)
+        getattr(self, "chords" if kind == "chord" else kind).emit(value)
+        self._remaining -= 1
+        if self._remaining == 0:
+            if self.analysis.timings:
+                self.timings.emit(self.analysis.timings)
+            self.result.emit(self.analysis)
+
+
+class AnalysisExecutor:
+    """Runs analysis jobs on a thread pool or a pool of warm worker processes.
+
+    In "thread" mode each file is one job that decodes once and shares the
+    signal between the analyzers. In "process" mode chords, key and rhythm
+    are separate jobs so they run on different cores, free of the GIL; the
+    analyses sharing a network pass (engine.SHARED_PASSES) stay together.
+    """
+
+    def __init__(self, mode=ANALYSIS_BACKEND, max_workers=POOL_SIZE, cache_root=CACHE_DIR,
+                 max_pending=MAX_PENDING_JOBS):
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.jobs = []
+        if mode == "thread":
+            self.engine = AnalysisEngine(
+                default_cache() if cache_root == CACHE_DIR else AnalysisCache(cache_root)
+            )
+            self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        elif mode == "process":
+            # Spawn, not fork: the GUI process has Qt, the media player and
+            # model threads running. init_worker rebuilds everything a worker needs.
+            self.pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker, initargs=(cache_root,)
+            )
+        else:
+            raise ValueError(f"Unknown analysis backend: {mode!r}")
+
+    def warm(self, wait=True):
+        """Start every worker now so the first file doesn't pay the spawn cost."""
+        if self.mode == "process":
+            futures = [self.pool.submit(ping) for _ in range(self.max_workers)]
+            if wait:
+                for future in futures:
+                    future.result()
+
+    def submit(self, audio_path, kinds=None, preempt=False):
+        """Queue the analyses in kinds (default: all) of audio_path.
+
+        Returns the job unstarted; call job.start() once its signals are
+        connected. preempt cancels every other unfinished job first. Past
+        max_pending unfinished jobs, the oldest are cancelled to make room.
+        """
+        self.jobs = [job for job in self.jobs if not job.done()]
+        if preempt:
+            self.cancel_all()
+        while self.max_pending and len(self.jobs) >= self.max_pending:
+            self.jobs.pop(0).cancel()
+        kinds = list(kinds or ANALYZERS)
+        launch = self._launch_thread if self.mode == "thread" else self._launch_process
+        job = AnalysisJob(audio_path, kinds, lambda job: launch(job, kinds))
+        self.jobs.append(job)
+        return job
+
+    def _launch_thread(self, job, kinds):
+        future = self.pool.submit(
+            self.engine.analyze, job.audio_path, job.deliver, kinds, job.analysis, job.token
+        )
+        future.add_done_callback(lambda f: self._report_error(job, f))
+        return [future]
+
+    def _launch_process(self, job, kinds):
+        futures = []
+        for group in group_kinds(kinds):
+            future = self.pool.submit(run_analysis, group, job.audio_path, timing.enabled)
+            future.add_done_callback(lambda f: self._deliver(job, f))
+            futures.append(future)
+        return futures
+
+    def _deliver(self, job, future):
+        if not self._report_error(job, future):
+            values, timings = future.result()
+            job.analysis.timings.update(timings)
+            for kind, value in values.items():
+                job.deliver(kind, value)
+
+    def _report_error(self, job, future):
+        if future.cancelled():
+            return True
+        exc = future.exception()
+        if exc is not None:
+            if not isinstance(exc, Cancelled) and not job.token.cancelled:
+                job.error.emit(str(exc))
+            return True
+        return False
+
+    def cancel_all(self):
+        for job in self.jobs:
+            job.cancel()
+        self.jobs = []
+
+    def shutdown(self, wait=True):
+        self.cancel_all()
+        self.pool.shutdown(wait=wait)
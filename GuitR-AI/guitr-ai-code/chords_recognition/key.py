@@ -1,36 +1,167 @@
-import os
-import hashlib
+import threading
+
+import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
 import madmom
+from madmom.features.key import KEY_LABELS
+from madmom.ml.nn.layers import AverageLayer
+
+from cache import default_cache
+from processors import load_signal, use_processor
+from timing import NULL_TIMER, new_timer
+
+# Part of the cache key: bump it whenever the key pipeline changes.
+KEY_CONFIG = "madmom-cnn-key:v1"
+KEY_SEGMENTS_CONFIG = "madmom-cnn-key:window=30:hop=5:v1"
+
+KEY_FPS = 5                   # spectrogram frame rate of the key CNN
+SEGMENT_WINDOW = 30           # seconds of audio behind each windowed key estimate
+SEGMENT_HOP = 5               # seconds between windowed key estimates
+
+def _averaged_axes(layer):
+    """The axes an AverageLayer averages over as a tuple, None for all of them."""
+    if layer.axis is None:
+        return None
+    if isinstance(layer.axis, (int, np.integer)):
+        return (int(layer.axis),)
+    return tuple(layer.axis)
+
+def _frame_logits(key_processor, signal):
+    # The key CNN is fully convolutional and ends in a global average over
+    # time and frequency. Stopping just before that average leaves one row
+    # of key logits per time step; their mean is exactly what the whole
+    # network would have produced. Returns None for any other layout.
+    sig, frames, stft, spec, ensemble = key_processor.processors[:5]
+    data = spec(stft(frames(sig(signal))))
+    outputs = []
+    for network in ensemble.processors[0].processors:
+        average = network.layers[-1]
+        if not isinstance(average, AverageLayer) or _averaged_axes(average) != (0, 1):
+            return None
+        steps = data
+        for layer in network.layers[:-1]:
+            steps = layer.activate(steps)
+        outputs.append(steps.mean(axis=1))
+    # The ensemble averages its networks' outputs, which commutes with the mean over time.
+    logits = sum(outputs) / len(outputs)
+    if not len(logits):
+        # Audio shorter than the network's receptive field has no time steps.
+        return logits, 0.0
+    return logits, len(data) / len(logits) / KEY_FPS
+
+def _memo_lock(signal):
+    """Lock for the key logits kept on this Signal, None for a plain ndarray."""
+    try:
+        # setdefault is atomic, so racing callers all get the same lock.
+        return vars(signal).setdefault("key_logits_lock", threading.Lock())
+    except TypeError:
+        return None
+
+def key_frame_logits(signal, timer=NULL_TIMER):
+    """(logits per time step, seconds per step) of the key CNN, None if unavailable.
+
+    Kept on the Signal like the beat activations, so the global key and the
+    key segments of one decode share a single pass of the network. The lock
+    is per Signal: a second caller for the same decode waits for that pass,
+    other tracks run alongside it.
+    """
+    lock = _memo_lock(signal)
+    if lock is None:
+        # A plain ndarray was passed in; nothing to share with.
+        with timer.stage("key_cnn"), use_processor("key") as key_processor:
+            return _frame_logits(key_processor, signal)
+    with lock:
+        cached = getattr(signal, "key_logits", None)
+        if cached is None:
+            with timer.stage("key_cnn"), use_processor("key") as key_processor:
+                cached = signal.key_logits = _frame_logits(key_processor, signal) or ()
+    return cached or None
+
+def recognize_key(audio, timer=NULL_TIMER):
+    """Key label for a file path or a decoded Signal."""
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    frame_logits = key_frame_logits(signal, timer)
+    if frame_logits is None or not len(frame_logits[0]):
+        with timer.stage("key_cnn"), use_processor("key") as key_processor:
+            key_prediction = key_processor(signal)
+        return madmom.features.key.key_prediction_to_label(key_prediction)
+    logits, _ = frame_logits
+    # softmax does not change the argmax, so the mean logits pick the same label.
+    return madmom.features.key.key_prediction_to_label(logits.mean(axis=0)[np.newaxis])
+
+def recognize_key_segments(audio, timer=NULL_TIMER):
+    """[(start, end, key label)] from SEGMENT_WINDOW windows of the key CNN's logits.
+
+    Window means come from cumulative sums over the time steps, so every
+    window costs the same regardless of its length. Neighbouring windows
+    with the same key are merged; a change of label marks a modulation.
+    """
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    frame_logits = key_frame_logits(signal, timer)
+    if frame_logits is None:
+        return None
+    logits, step = frame_logits
+    if not len(logits):
+        return []
+    with timer.stage("key_windows"):
+        window = max(1, min(len(logits), round(SEGMENT_WINDOW / step)))
+        hop = max(1, round(SEGMENT_HOP / step))
+        ends = np.arange(window, len(logits) + 1, hop)
+        if ends[-1] != len(logits):
+            ends = np.append(ends, len(logits))
+        cumulative = np.concatenate((np.zeros((1, logits.shape[1])), np.cumsum(logits, axis=0)))
+        labels = (cumulative[ends] - cumulative[ends - window]).argmax(axis=1)
+        centres = (ends - window / 2) * step
+        # Each window owns the time up to halfway to its neighbours.
+        bounds = np.concatenate(([0.0], (centres[1:] + centres[:-1]) / 2,
+                                 [len(signal) / signal.sample_rate]))
+        segments = []
+        for i, label in enumerate(labels):
+            if segments and segments[-1][2] == KEY_LABELS[label]:
+                segments[-1] = (segments[-1][0], float(bounds[i + 1]), KEY_LABELS[label])
+            else:
+                segments.append((float(bounds[i]), float(bounds[i + 1]), KEY_LABELS[label]))
+    return segments
+
+def key_at(segments, seconds):
+    """Key label of the segment playing at seconds, None if there is none."""
+    for start, end, label in segments or ():
+        if start <= seconds < end:
+            return label
+    return None
 
 class KeyRecognitionThread(QThread):
     result = pyqtSignal(str)
+    timings = pyqtSignal(dict)
 
     def __init__(self, audio_path):
         super().__init__()
         self.audio_path = audio_path
 
     def run(self):
-        cache_dir = "cache/key/"
-        os.makedirs(cache_dir, exist_ok=True)
-        hash_object = hashlib.md5(self.audio_path.encode())
-        hashed_filename = hash_object.hexdigest() + ".txt"
-        cache_file = os.path.join(cache_dir, hashed_filename)
-
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                cached_key = f.read().strip()
+        cache = default_cache()
+        timer = new_timer("key", self.audio_path)
+        with timer.stage("cache_lookup"):
+            cached_key = cache.get("key", self.audio_path, KEY_CONFIG)
+        if cached_key is not None:
             self.result.emit(cached_key)
+            self.report(timer)
             self.quit()
             return
 
         try:
-            key_processor = madmom.features.key.CNNKeyRecognitionProcessor()
-            key_prediction = key_processor(self.audio_path)
-            key = madmom.features.key.key_prediction_to_label(key_prediction)
-            with open(cache_file, "w") as f:
-                f.write(key)
+            key = recognize_key(self.audio_path, timer)
+            with timer.stage("cache_write"):
+                cache.put("key", self.audio_path, KEY_CONFIG, key)
             self.result.emit(key)
         except Exception as e:
             self.result.emit("Error")
+        self.report(timer)
         self.quit()
+
+    def report(self, timer):
+        if timer.stages:
+            timer.log()
+            self.timings.emit({"key": timer.stages})
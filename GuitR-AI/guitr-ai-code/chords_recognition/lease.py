@@ -0,0 +1,141 @@
+"""Lease files that let processes sharing a cache avoid duplicate work.
+
+Whoever creates <entry>.lease computes the entry; everyone else waits for
+the lease to go away and reads the result. The holder renews the lease's
+mtime while it works, so a lease left behind by a crashed process goes
+stale after LEASE_TTL and can be broken. Breakers take turns through an
+O_EXCL <entry>.lease.break file, so a lease is only ever broken once.
+
+Each lease file names its owner with a random token. A holder that stalled
+past LEASE_TTL (a laptop going to sleep is enough) may find its lease
+broken and taken by another process; releasing then leaves that lease be.
+"""
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+
+LEASE_TTL = 30.0              # seconds without renewal before a lease is abandoned
+RENEW_INTERVAL = LEASE_TTL / 3
+POLL_INTERVAL = 0.25
+BREAK_LOCK_POLL = 0.01        # the break lock is only ever held for a few syscalls
+
+
+def _is_stale(path):
+    try:
+        return time.time() - os.path.getmtime(path) > LEASE_TTL
+    except OSError:
+        return False  # already gone
+
+
+def _owner(path):
+    """The owner token written into a lease file, None if it can't be read."""
+    try:
+        with open(path) as f:
+            return json.load(f).get("owner")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _take_break_lock(path):
+    """Create path.break; False if another process holds it."""
+    break_path = f"{path}.break"
+    try:
+        fd = os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # A break file this old was left by a process that crashed while
+        # holding it; clear it so the next try succeeds.
+        if _is_stale(break_path):
+            try:
+                os.remove(break_path)
+            except OSError:
+                pass
+        return False
+    os.close(fd)
+    return True
+
+
+def _break_stale(path):
+    """Remove the abandoned lease on path, unless it was renewed or replaced.
+
+    Several processes may find the same stale lease. Each re-checks it
+    while holding path.break, so one that looked before another broke the
+    lease and took a fresh one never removes that fresh lease.
+    """
+    if not _take_break_lock(path):
+        return  # someone else is breaking it
+    try:
+        if _is_stale(path):
+            os.remove(path)
+    except OSError:
+        pass
+    finally:
+        os.remove(f"{path}.break")
+
+
+class Lease:
+    """An exclusive claim on computing one cache entry, renewed in the background."""
+
+    def __init__(self, path, owner):
+        self.path = path
+        self.owner = owner
+        self._stop = threading.Event()
+        self._renewer = threading.Thread(target=self._renew, daemon=True)
+        self._renewer.start()
+
+    @classmethod
+    def acquire(cls, path):
+        """The lease on path, or None if another live process holds it."""
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not _is_stale(path):
+                    return None
+                _break_stale(path)
+                continue
+            owner = uuid.uuid4().hex
+            with os.fdopen(fd, "w") as f:
+                json.dump({"pid": os.getpid(), "host": socket.gethostname(), "owner": owner}, f)
+            return cls(path, owner)
+        return None
+
+    def _renew(self):
+        while not self._stop.wait(RENEW_INTERVAL):
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def release(self):
+        """Remove the lease file if it is still ours.
+
+        Checked under the break lock, so the lease can't be broken and
+        taken over between reading its owner and removing it.
+        """
+        self._stop.set()
+        while not _take_break_lock(self.path):
+            time.sleep(BREAK_LOCK_POLL)
+        try:
+            if _owner(self.path) == self.owner:
+                os.remove(self.path)
+        except OSError:
+            pass
+        finally:
+            os.remove(f"{self.path}.break")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def wait_released(path, token=None):
+    """Block until nobody holds a live lease on path; token cancels the wait."""
+    while os.path.exists(path) and not _is_stale(path):
+        if token is not None:
+            token.check()
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,253 @@
+"""Real-time chord recognition from an input device or a replayed file.
+
+    python live.py                 # default input device
+    python live.py --device 3
+    python live.py --file song.wav # replay a file in real time as a stand-in stream
+
+Device capture needs the optional `sounddevice` package.
+"""
+import compat  # must run before madmom is imported
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from madmom.audio.signal import Signal
+
+from chords import format_chord_label
+from config import LIVE_INPUT_DEVICE, LIVE_LATENCY_TARGET_MS
+from processors import SAMPLE_RATE, use_processor
+
+BLOCK_SIZE = 2205             # 50 ms capture blocks
+WINDOW_SECONDS = 1.5          # audio the chord CNN sees per analysis
+HOP_SECONDS = 0.1             # analysis rate
+QUEUE_BLOCKS = 40             # capture blocks buffered before we start dropping
+
+
+class RingBuffer:
+    """Fixed-size float32 buffer holding the most recent samples."""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.pos = 0
+        self.filled = 0
+
+    def write(self, samples):
+        samples = samples[-len(self.data):]
+        end = self.pos + len(samples)
+        if end <= len(self.data):
+            self.data[self.pos:end] = samples
+        else:
+            split = len(self.data) - self.pos
+            self.data[self.pos:] = samples[:split]
+            self.data[:end - len(self.data)] = samples[split:]
+        self.pos = end % len(self.data)
+        self.filled = min(len(self.data), self.filled + len(samples))
+
+    def latest(self, count):
+        count = min(count, self.filled)
+        start = self.pos - count
+        if start >= 0:
+            return self.data[start:self.pos].copy()
+        return np.concatenate((self.data[start:], self.data[:self.pos]))
+
+
+class LiveStats:
+    """End-to-end latency (capture to label) and dropped capture blocks."""
+
+    def __init__(self, target_ms=LIVE_LATENCY_TARGET_MS):
+        self.target_ms = target_ms
+        self.latencies = deque(maxlen=200)
+        self.dropped = 0
+        self.over_target = 0
+
+    def record(self, latency_ms):
+        self.latencies.append(latency_ms)
+        if latency_ms > self.target_ms:
+            self.over_target += 1
+
+    def snapshot(self):
+        latencies = np.asarray(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            "latency_ms": float(latencies.mean()),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "max_ms": float(latencies.max()),
+            "dropped": self.dropped,
+            "over_target": self.over_target,
+        }
+
+
+class DeviceSource:
+    """Captures mono blocks from a sound card."""
+
+    def __init__(self, device=LIVE_INPUT_DEVICE):
+        self.device = device
+        self.stream = None
+
+    def start(self, push):
+        try:
+            import sounddevice
+        except ImportError:
+            raise RuntimeError("Live input needs the sounddevice package (pip install sounddevice)")
+
+        def callback(indata, frames, time_info, status):
+            push(indata[:, 0].copy(), time.perf_counter(), bool(status.input_overflow))
+
+        self.stream = sounddevice.InputStream(
+            device=self.device, channels=1, samplerate=SAMPLE_RATE,
+            blocksize=BLOCK_SIZE, dtype="float32", callback=callback,
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+
+
+class FileSource:
+    """Replays a decoded file in real time, block by block, like a sound card."""
+
+    def __init__(self, audio_path):
+        self.audio_path = audio_path
+        self.running = False
+        self.done = False
+
+    def start(self, push):
+        signal = Signal(self.audio_path, sample_rate=SAMPLE_RATE, num_channels=1, dtype=np.float32)
+        self.running = True
+
+        def replay():
+            start = time.perf_counter()
+            for index, offset in enumerate(range(0, len(signal), BLOCK_SIZE)):
+                if not self.running:
+                    return
+                delay = start + (index + 1) * BLOCK_SIZE / SAMPLE_RATE - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                push(np.asarray(signal[offset:offset + BLOCK_SIZE]), time.perf_counter(), False)
+            self.done = True
+
+        threading.Thread(target=replay, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+
+class LiveChordRecognizer:
+    """Runs the chord CNN and CRF over a ring buffer of the newest audio."""
+
+    def __init__(self, source, on_chord, on_stats=None):
+        self.source = source
+        self.on_chord = on_chord
+        self.on_stats = on_stats
+        self.blocks = queue.Queue(maxsize=QUEUE_BLOCKS)
+        self.ring = RingBuffer(int(WINDOW_SECONDS * SAMPLE_RATE))
+        self.stats = LiveStats()
+        self.running = False
+
+    def push(self, samples, captured_at, overflowed):
+        # Called from the capture thread; never block it.
+        if overflowed:
+            self.stats.dropped += 1
+        try:
+            self.blocks.put_nowait((samples, captured_at))
+        except queue.Full:
+            self.stats.dropped += 1
+
+    def recognize(self, samples):
+        window = Signal(samples, sample_rate=SAMPLE_RATE, num_channels=1)
+        with use_processor("chord_features") as feat_processor:
+            feats = feat_processor(window)
+        with use_processor("chord_crf") as recog_processor:
+            segments = recog_processor(feats)
+        return format_chord_label(segments[-1][2]) if len(segments) else None
+
+    def run(self):
+        self.running = True
+        self.source.start(self.push)
+        last_analysis = last_stats = time.perf_counter()
+        current = None
+        try:
+            while self.running:
+                try:
+                    samples, captured_at = self.blocks.get(timeout=0.5)
+                except queue.Empty:
+                    if getattr(self.source, "done", False):
+                        break
+                    continue
+                self.ring.write(samples)
+                # Catch up on everything captured meanwhile before analyzing.
+                while not self.blocks.empty():
+                    samples, captured_at = self.blocks.get_nowait()
+                    self.ring.write(samples)
+                now = time.perf_counter()
+                if now - last_analysis < HOP_SECONDS or self.ring.filled < len(self.ring.data):
+                    continue
+                last_analysis = now
+                label = self.recognize(self.ring.latest(len(self.ring.data)))
+                self.stats.record(1000 * (time.perf_counter() - captured_at))
+                if label is not None and label != current:
+                    current = label
+                    self.on_chord(label)
+                if self.on_stats is not None and now - last_stats >= 1.0:
+                    last_stats = now
+                    self.on_stats(self.stats.snapshot())
+        finally:
+            self.source.stop()
+
+    def stop(self):
+        self.running = False
+
+
+class LiveChordThread(QThread):
+    chord = pyqtSignal(str)
+    stats = pyqtSignal(dict)
+    error = pyqtSignal(str)     # the capture or recognition failed; the thread has stopped
+
+    def __init__(self, audio_path=None, device=LIVE_INPUT_DEVICE):
+        super().__init__()
+        source = FileSource(audio_path) if audio_path else DeviceSource(device)
+        self.recognizer = LiveChordRecognizer(source, self.chord.emit, self.stats.emit)
+
+    def run(self):
+        try:
+            self.recognizer.run()
+        except Exception as e:
+            # E.g. no sounddevice or no input device; raised here it would
+            # only reach the excepthook.
+            self.error.emit(str(e))
+
+    def stop(self):
+        self.recognizer.stop()
+        self.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--device", default=LIVE_INPUT_DEVICE,
+                        type=lambda text: int(text) if text.isdigit() else text,
+                        help="input device index or name")
+    parser.add_argument("--file", help="replay this file instead of capturing")
+    args = parser.parse_args()
+
+    source = FileSource(args.file) if args.file else DeviceSource(args.device)
+    recognizer = LiveChordRecognizer(
+        source,
+        on_chord=lambda label: print(f"chord: {label}"),
+        on_stats=lambda s: print(
+            f"latency {s['latency_ms']:.0f} ms (p95 {s['p95_ms']:.0f}, max {s['max_ms']:.0f}), "
+            f"dropped {s['dropped']}, over target {s['over_target']}"
+        ),
+    )
+    try:
+        recognizer.run()
+    except KeyboardInterrupt:
+        recognizer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,13 @@
- # === Monkey Patch for Python 3.11 Compatibility ===
-import collections
-try:
-    collections.MutableSequence
-except AttributeError:
-    import collections.abc
-    collections.MutableSequence = collections.abc.MutableSequence
-# ================================================
-
-# --- Monkey Patch for NumPy deprecation of np.int and np.float ---
+import compat  # must run before madmom is imported
 import numpy as np
-if not hasattr(np, 'int'):
-    np.int = int
-if not hasattr(np, 'float'):
-    np.float = float
-# -----------------------------------------------------
 
 import os
 import sys
+import math
 import traceback
 import subprocess
+import threading
+import logging
 import base64
 
 from PyQt5.QtWidgets import (
@@ -32,6 +21,16 @@ from interface import *
 from chords import *
 from key import *
 from tempo import *
+from engine import *
+from executor import AnalysisExecutor
+from beatsync import bar_index, chords_per_bar, format_bar_chart, quantize_chords
+from streaming import StreamingChordThread
+from live import LiveChordThread
+from cancellation import guard
+from prefetch import clear_playing, mark_playing, start_prefetcher
+from config import STREAM_CHORDS
+from processors import preload
+import timing
 
 # Import themes from theme.py (make sure theme.py is in the same folder)
 from theme import light_theme, dark_theme
@@ -54,6 +53,19 @@ CHORD_IMAGE_MAP = {
     "Gm": "g-minor-3.gif",
     # Extend this mapping as needed.
 }
+CHORD_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chords_images")
+# Shown in place of a diagram while no chord is playing.
+DEFAULT_CHORD_IMAGE = "GuitR-AILogo.png"
+
+# Slider and time label refresh at this interval; chord changes have their
+# own timer, armed for the next boundary.
+PROGRESS_INTERVAL_MS = 100
+# The chord progress fill animates at ~60 fps while playing. Painting is
+# cheap: only the pixels the fill edge moved over are blitted from a cache.
+ANIMATION_INTERVAL_MS = 16
+# Shortest re-arm of the chord timer, so a player whose position lags
+# behind the wall clock cannot make it spin.
+MIN_CHORD_TIMER_MS = 10
 
 # --------------------------------------------
 # Custom widget for chord progress background
@@ -69,15 +81,26 @@ class ChordProgressWidget(QWidget):
         self.base_color = QColor("#23B5D3")
         # Corner radius for the background.
         self.corner_radius = 20
+        # Rounded background and fill, pre-rendered for cache_key; see renderPixmaps().
+        self.background_pixmap = self.fill_pixmap = None
+        self.cache_key = None
+
+    def progressWidth(self):
+        return int(self.width() * self.progress_fraction)
 
     def setProgress(self, fraction):
-        """Update the progress fraction (0.0 to 1.0) and repaint."""
+        """Update the progress fraction (0.0 to 1.0) and repaint only the strip
+        between the old and the new edge of the fill, if it moved at all."""
+        old_width = self.progressWidth()
         self.progress_fraction = max(0.0, min(fraction, 1.0))
-        self.update()
+        new_width = self.progressWidth()
+        if new_width != old_width:
+            self.update(QRect(min(old_width, new_width), 0, abs(new_width - old_width), self.height()))
 
     def setCornerRadius(self, radius):
         """Allow setting the container's corner radius on the fly."""
         self.corner_radius = radius
+        self.cache_key = None
         self.update()
 
     def updateThemeColors(self, is_dark):
@@ -89,25 +112,51 @@ class ChordProgressWidget(QWidget):
         else:
             self.base_color = QColor("#12a4c2")  # Blue-ish for light mode.
             self.progress_color = QColor("#23B5D3")
+        self.cache_key = None
         self.update()
 
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    def renderRounded(self, color, ratio):
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing)
-
-        rect = self.rect()
-        rectF = QRectF(rect)
         path = QPainterPath()
-        path.addRoundedRect(rectF, float(self.corner_radius), float(self.corner_radius))
-        painter.setClipPath(path)
+        path.addRoundedRect(QRectF(self.rect()), float(self.corner_radius), float(self.corner_radius))
+        painter.fillPath(path, color)
+        painter.end()
+        return pixmap
+
+    def renderPixmaps(self):
+        """Render the rounded background and fill once per size, radius, colors and DPI."""
+        ratio = self.devicePixelRatioF()
+        key = (self.width(), self.height(), ratio)
+        if key == self.cache_key:
+            return
+        self.background_pixmap = self.renderRounded(self.base_color, ratio)
+        self.fill_pixmap = self.renderRounded(self.progress_color, ratio)
+        self.cache_key = key
+
+    def paintEvent(self, event):
+        if self.width() <= 0 or self.height() <= 0:
+            return
+        self.renderPixmaps()
+        painter = QPainter(self)
+        ratio = self.devicePixelRatioF()
+        # Left of the fill edge comes from the fill pixmap, right of it from the
+        # background; only the part of each inside the damaged area is copied.
+        progress_width = self.progressWidth()
+        dirty = event.rect()
+        for area, pixmap in (
+            (QRect(0, 0, progress_width, self.height()), self.fill_pixmap),
+            (QRect(progress_width, 0, self.width() - progress_width, self.height()), self.background_pixmap),
+        ):
+            area = area.intersected(dirty)
+            if not area.isEmpty():
+                source = QRectF(area.x() * ratio, area.y() * ratio, area.width() * ratio, area.height() * ratio)
+                painter.drawPixmap(QRectF(area), pixmap, source)
+        painter.end()
 
-        painter.fillRect(rect, self.base_color)
-        
-        progress_width = int(rect.width() * self.progress_fraction)
-        if progress_width > 0:
-            progress_rect = QRect(rect.x(), rect.y(), progress_width, rect.height())
-            painter.fillRect(progress_rect, self.progress_color)
-        
         super().paintEvent(event)
 
 
@@ -162,15 +211,12 @@ class MainWindow(QMainWindow):
             self.ui.currentChordImageLabel.setAlignment(Qt.AlignCenter)
             self.ui.currentChordImageLabel.setStyleSheet("background: transparent;")
         
-        default_logo_path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)),
-            "chords_images",
-            "GuitR-AILogo.png"
-        )
-        if os.path.exists(default_logo_path):
-            default_pixmap = QPixmap(default_logo_path)
-            default_pixmap = self.roundCornersPixmap(default_pixmap, radius=20)
-            self.ui.currentChordImageLabel.setPixmap(default_pixmap)
+        # Every diagram is decoded and rounded once here; playback only swaps pixmaps.
+        self.chord_pixmaps = self.load_chord_pixmaps()
+        # Image currently in currentChordImageLabel, so unchanged ones are not set again.
+        self.shown_chord_image = DEFAULT_CHORD_IMAGE
+        if self.chord_pixmaps.get(DEFAULT_CHORD_IMAGE) is not None:
+            self.ui.currentChordImageLabel.setPixmap(self.chord_pixmaps[DEFAULT_CHORD_IMAGE])
         
         self.currentChordLayout.addWidget(self.ui.currentChordNameLabel)
         self.currentChordLayout.addWidget(self.ui.currentChordImageLabel)
@@ -224,7 +270,21 @@ class MainWindow(QMainWindow):
         self.show()
         
         self.offset = None
+        self.track_timings = {}
+        self.live_thread = None
+        self.live_history = []
+        self.chord_thread = None
+        self.analysis_job = None
+        self.cancelled_threads = []
+        # Chords as recognized, and as shown: snapped to the beat grid once there is one.
+        self.detected_chords = []
         self.chords = []
+        self.chord_starts = self.chord_ends = np.zeros(0)
+        self.beats = []
+        self.bars = []
+        self.bar_starts = []
+        self.tempo_curve = None
+        self.key_segments = []
         self.chord_index = 0
         self.start_time = None
         self.is_muted = False
@@ -235,13 +295,30 @@ class MainWindow(QMainWindow):
         
         from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
         self.player = QMediaPlayer()
-        self.player.positionChanged.connect(self.update_chords)
         self.player.durationChanged.connect(self.update_duration)
         self.player.stateChanged.connect(self.update_state)
         self.player.mediaStatusChanged.connect(self.update_media)
         
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_position)
+        # Fires once at the end of the current chord; update_chords re-arms it.
+        self.chord_timer = QTimer(self)
+        self.chord_timer.setSingleShot(True)
+        self.chord_timer.setTimerType(Qt.PreciseTimer)
+        self.chord_timer.timeout.connect(lambda: self.update_chords(self.player.position()))
+        # Drives the chord progress fill while playing, independent of both.
+        self.animation_timer = QTimer(self)
+        self.animation_timer.setInterval(ANIMATION_INTERVAL_MS)
+        self.animation_timer.timeout.connect(lambda: self.update_chord_progress(self.player.position()))
+
+        # Backend and pool size come from config.py (GUITR_ANALYSIS_BACKEND / GUITR_POOL_SIZE).
+        self.executor = AnalysisExecutor()
+        self.executor.warm(wait=False)
+        if self.executor.mode == "thread":
+            # Load the madmom models in the background while the window comes up.
+            threading.Thread(target=preload, daemon=True).start()
+        # Analyzes new files in GUITR_WATCH_DIRS at idle priority; pauses while we play.
+        self.prefetcher = start_prefetcher()
         
         self.ui.minimizeBtn.clicked.connect(lambda: self.showMinimized())
         self.ui.closeBtn.clicked.connect(lambda: self.close())
@@ -259,7 +336,7 @@ class MainWindow(QMainWindow):
         self.ui.volumeSlider.sliderMoved.connect(self.set_volume)
         self.ui.mediaProgressSlider.sliderPressed.connect(lambda: self.timer.stop())
         self.ui.mediaProgressSlider.sliderMoved.connect(self.set_position)
-        self.ui.mediaProgressSlider.sliderReleased.connect(lambda: self.timer.start(100))
+        self.ui.mediaProgressSlider.sliderReleased.connect(lambda: self.timer.start(PROGRESS_INTERVAL_MS))
         
         self.resize(1200, 800)
         self.setMinimumSize(1024, 768)
@@ -269,6 +346,16 @@ class MainWindow(QMainWindow):
         # Also set the initial backMenuButton style.
         self.updateBackMenuButtonStyle(self.is_dark)
     
+    def load_chord_pixmaps(self):
+        """Image file name -> rounded QPixmap (None if missing) for every diagram and the logo."""
+        pixmaps = {}
+        for filename in set(CHORD_IMAGE_MAP.values()) | {DEFAULT_CHORD_IMAGE}:
+            path = os.path.join(CHORD_IMAGE_DIR, filename)
+            pixmap = QPixmap(path) if os.path.exists(path) else None
+            pixmaps[filename] = (self.roundCornersPixmap(pixmap, radius=20)
+                                 if pixmap is not None and not pixmap.isNull() else None)
+        return pixmaps
+
     def roundCornersPixmap(self, pixmap, radius):
         size = pixmap.size()
         rounded = QPixmap(size)
@@ -337,10 +424,23 @@ class MainWindow(QMainWindow):
         self.updateBackMenuButtonStyle(self.is_dark)
 
     def update_position(self):
+        mark_playing()
         position = self.player.position()
         self.ui.mediaProgressSlider.setValue(position)
-        self.ui.currentPlayedLabel.setText(f'{position // 60000}:{(position % 60000) // 1000:02d}')
-        self.update_chords(position)
+        played = f'{position // 60000}:{(position % 60000) // 1000:02d}'
+        if self.bars:
+            bar = bar_index(self.bar_starts, position / 1000.0)
+            if bar >= 0:
+                played += f'  bar {bar + 1}'
+        local_tempo = tempo_at(self.tempo_curve, position / 1000.0)
+        if local_tempo is not None:
+            played += f'  {local_tempo} BPM'
+        if len(self.key_segments) > 1:
+            # Only worth showing when the track modulates.
+            local_key = key_at(self.key_segments, position / 1000.0)
+            if local_key:
+                played += f'  {local_key}'
+        self.ui.currentPlayedLabel.setText(played)
 
     def update_duration(self, duration):
         self.ui.mediaProgressSlider.setRange(0, duration)
@@ -352,7 +452,7 @@ class MainWindow(QMainWindow):
             self.timer.stop()
         else:
             self.player.play()
-            self.timer.start(100)
+            self.timer.start(PROGRESS_INTERVAL_MS)
 
     def seek(self, milliseconds):
         new_position = self.player.position() + milliseconds
@@ -374,17 +474,13 @@ class MainWindow(QMainWindow):
         self.ui.volumeSlider.setEnabled(not self.is_muted)
 
     def update_chords(self, position):
-        current_time = position
-        if self.chord_index > 0 and self.chord_index < len(self.chords) and self.chords[self.chord_index][1] > current_time / 1000.0:
-            self.chord_index = 0
-        while self.chord_index < len(self.chords) and self.chords[self.chord_index][1] <= current_time / 1000.0:
-            self.chord_index += 1
+        current_time = position / 1000.0
+        # Binary search, so seeks cost the same in either direction and anywhere in the song.
+        self.chord_index = chord_at(self.chord_ends, current_time)
 
         pre_previous_chord = previous_chord = current_chord = next_chord = post_next_chord = None
         if self.chord_index < len(self.chords):
             current_chord = self.chords[self.chord_index][2]
-            current_chord_start_time = self.chords[self.chord_index][0]
-            current_chord_end_time = self.chords[self.chord_index][1]
             if self.chord_index > 0:
                 previous_chord = self.chords[self.chord_index - 1][2]
             if self.chord_index > 1:
@@ -393,48 +489,104 @@ class MainWindow(QMainWindow):
                 next_chord = self.chords[self.chord_index + 1][2]
             if self.chord_index + 2 < len(self.chords):
                 post_next_chord = self.chords[self.chord_index + 2][2]
-
-            chord_duration = current_chord_end_time - current_chord_start_time
-            time_elapsed = (current_time / 1000.0) - current_chord_start_time
-            if chord_duration > 0:
-                progress_fraction = time_elapsed / chord_duration
-                self.chordContainer.setProgress(progress_fraction)
-
-        self.ui.prePrevChordBtn.setText(f"{pre_previous_chord}" if pre_previous_chord else "")
-        self.ui.prevChordBtn.setText(f"{previous_chord}" if previous_chord else "")
-        self.ui.nxtChordBtn.setText(f"{next_chord}" if next_chord else "")
-        self.ui.postNxtChordBtn.setText(f"{post_next_chord}" if post_next_chord else "")
-
-        if current_chord:
-            self.ui.currentChordNameLabel.setText(current_chord)
-            chord_image_filename = CHORD_IMAGE_MAP.get(current_chord)
-            if chord_image_filename:
-                chord_image_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)),
-                    "chords_images",
-                    chord_image_filename
-                )
-                if os.path.exists(chord_image_path):
-                    pixmap = QPixmap(chord_image_path)
-                    pixmap = self.roundCornersPixmap(pixmap, radius=20)
-                    self.ui.currentChordImageLabel.setPixmap(pixmap)
-                else:
-                    self.ui.currentChordImageLabel.clear()
-            else:
-                self.ui.currentChordImageLabel.clear()
+            self.update_chord_progress(position)
+
+        self.set_text(self.ui.prePrevChordBtn, pre_previous_chord or "")
+        self.set_text(self.ui.prevChordBtn, previous_chord or "")
+        self.set_text(self.ui.nxtChordBtn, next_chord or "")
+        self.set_text(self.ui.postNxtChordBtn, post_next_chord or "")
+
+        self.set_current_chord(current_chord)
+        self.schedule_chord_change(position)
+
+    def update_chord_progress(self, position):
+        """Fill the current chord's box by the share of it played so far."""
+        if self.chord_index >= len(self.chords):
+            return
+        start, end = self.chord_starts[self.chord_index], self.chord_ends[self.chord_index]
+        if end > start:
+            self.chordContainer.setProgress((position / 1000.0 - start) / (end - start))
+
+    def schedule_chord_change(self, position):
+        """Arm the chord timer for the end of the current chord.
+
+        position is the freshest playback position the caller has: the target
+        of a seek (player.position() can lag behind setPosition), otherwise
+        player.position() itself. Measuring every delay from the player rather
+        than from the last boundary keeps timer jitter from accumulating; if
+        the timer fires early, update_chords finds the same chord and re-arms.
+        """
+        self.chord_timer.stop()
+        if self.player.state() != self.player.PlayingState or self.chord_index >= len(self.chord_ends):
+            return
+        delay = self.chord_ends[self.chord_index] * 1000.0 - position
+        self.chord_timer.start(max(math.ceil(delay), MIN_CHORD_TIMER_MS))
+
+    def set_text(self, widget, text):
+        # Every setText relayouts and repaints, even with the same text.
+        if widget.text() != text:
+            widget.setText(text)
+
+    def set_current_chord(self, current_chord):
+        self.set_text(self.ui.currentChordNameLabel, current_chord or "")
+        image = CHORD_IMAGE_MAP.get(current_chord) if current_chord else DEFAULT_CHORD_IMAGE
+        if image == self.shown_chord_image:
+            return
+        self.shown_chord_image = image
+        pixmap = self.chord_pixmaps.get(image)
+        if pixmap is not None:
+            self.ui.currentChordImageLabel.setPixmap(pixmap)
         else:
-            self.ui.currentChordNameLabel.setText("")
-            default_logo_path = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)),
-                "chords_images",
-                "GuitR-AILogo.png"
-            )
-            if os.path.exists(default_logo_path):
-                default_pixmap = QPixmap(default_logo_path)
-                default_pixmap = self.roundCornersPixmap(default_pixmap, radius=20)
-                self.ui.currentChordImageLabel.setPixmap(default_pixmap)
-            else:
-                self.ui.currentChordImageLabel.clear()
+            self.ui.currentChordImageLabel.clear()
+
+    def toggle_live(self):
+        """Start or stop live chord recognition from the input device."""
+        if self.live_thread is not None:
+            self.live_thread.stop()
+            self.live_thread = None
+            self.ui.keyLabel.clear()
+            self.set_current_chord(None)
+            return
+        self.timer.stop()
+        self.player.pause()
+        # Live mode gets the CPU to itself, and no late file result may
+        # overwrite the live stats in keyLabel.
+        self.cancel_analysis()
+        self.detected_chords = []
+        self.refresh_chords()
+        self.live_history = []
+        self.ui.keyLabel.clear()
+        self.ui.appStacks.setCurrentIndex(0)
+        self.ui.mediaTitleLabel.setText("Live Input")
+        self.live_thread = LiveChordThread()
+        self.live_thread.chord.connect(self.on_live_chord)
+        self.live_thread.stats.connect(self.on_live_stats)
+        self.live_thread.error.connect(self.on_live_error)
+        self.live_thread.start()
+
+    def on_live_chord(self, chord):
+        self.live_history = (self.live_history + [chord])[-3:]
+        history = [None] * (3 - len(self.live_history)) + self.live_history
+        self.set_text(self.ui.prePrevChordBtn, history[0] or "")
+        self.set_text(self.ui.prevChordBtn, history[1] or "")
+        self.set_text(self.ui.nxtChordBtn, "")
+        self.set_text(self.ui.postNxtChordBtn, "")
+        self.chordContainer.setProgress(0.0)
+        self.set_current_chord(chord)
+
+    def on_live_error(self, message):
+        if self.sender() is not self.live_thread:
+            return  # a thread already stopped by toggling live mode off
+        logging.getLogger(__name__).error("Live input failed: %s", message)
+        self.toggle_live()
+        self.ui.mediaTitleLabel.clear()
+        QMessageBox.warning(self, "Live Input Failed", message)
+
+    def on_live_stats(self, stats):
+        self.ui.keyLabel.setText(
+            f"Live  |  {stats['latency_ms']:.0f} ms (p95 {stats['p95_ms']:.0f})  |  {stats['dropped']} dropped"
+        )
+        self.ui.keyLabel.show()
 
     def update_media(self, status):
         from PyQt5.QtMultimedia import QMediaPlayer
@@ -450,6 +602,13 @@ class MainWindow(QMainWindow):
         self.player.setVolume(volume)
 
     def update_state(self, state):
+        if state == self.player.PlayingState:
+            self.update_chords(self.player.position())
+            self.animation_timer.start()
+        else:
+            self.chord_timer.stop()
+            self.animation_timer.stop()
+            clear_playing()
         icons = {self.player.PlayingState: "pause.svg", self.player.PausedState: "play.svg"}
         self.ui.mediaPlayBtn.setIcon(QIcon(f":/icons/{icons.get(state, 'play.svg')}"))
 
@@ -485,17 +644,48 @@ class MainWindow(QMainWindow):
             self.ui.errGif.start()
             self.ui.loadingGif.start()
             self.ui.appStacks.setCurrentIndex(self.load_stack)
-            self.chord_thread = ChordRecognitionThread(fileName)
-            self.chord_thread.result.connect(self.on_chords_recognized)
-            self.chord_thread.start()
-            self.tempo_thread = TempoDetectionThread(fileName)
-            self.tempo_thread.result.connect(self.on_tempo_detected)
-            self.tempo_thread.start()
-            self.key_thread = KeyRecognitionThread(fileName)
-            self.key_thread.result.connect(self.on_key_recognized)
-            self.key_thread.start()
+            self.detected_chords = []
+            self.beats = []
+            self.tempo_curve = None
+            self.key_segments = []
+            self.refresh_chords()
+            self.track_timings = {}
+            # Only the track on screen gets CPU: stop whatever the last one left running.
+            self.cancel_analysis()
+            if STREAM_CHORDS:
+                # Chords arrive block by block; everything else still goes through the executor.
+                thread = self.chord_thread = StreamingChordThread(fileName)
+                thread.segments.connect(guard(self.on_chord_segments, thread.token))
+                thread.result.connect(guard(self.on_chords_recognized, thread.token))
+                thread.timings.connect(guard(self.on_timings, thread.token))
+                thread.start()
+                job = self.executor.submit(
+                    fileName, kinds=[kind for kind in ANALYZERS if kind != "chord"], preempt=True)
+            else:
+                job = self.executor.submit(fileName, preempt=True)
+                job.chords.connect(guard(self.on_chords_recognized, job.token))
+            self.analysis_job = job
+            job.tempo.connect(guard(self.on_tempo_detected, job.token))
+            job.beats.connect(guard(self.on_beats_detected, job.token))
+            job.tempo_curve.connect(guard(self.on_tempo_curve, job.token))
+            job.key_segments.connect(guard(self.on_key_segments, job.token))
+            job.key.connect(guard(self.on_key_recognized, job.token))
+            job.timings.connect(guard(self.on_timings, job.token))
+            job.error.connect(guard(self.on_analysis_error, job.token))
+            job.start()
             self.player.setMedia(QMediaContent(QUrl.fromLocalFile(fileName)))
 
+    def cancel_analysis(self):
+        if self.chord_thread is not None:
+            self.chord_thread.cancel()
+            # Keep a reference until it stops: deleting a running QThread aborts the app.
+            self.cancelled_threads = [t for t in self.cancelled_threads if t.isRunning()]
+            self.cancelled_threads.append(self.chord_thread)
+            self.chord_thread = None
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+            self.analysis_job = None
+
     def on_tempo_detected(self, tempo):
         self.tempo = tempo
         current_text = self.ui.keyLabel.text()
@@ -506,8 +696,44 @@ class MainWindow(QMainWindow):
             self.ui.keyLabel.setText(f"{tempo} BPM")
         self.ui.keyLabel.show()
 
+    def on_beats_detected(self, beats):
+        self.beats = beats
+        self.refresh_chords()
+
+    def on_tempo_curve(self, curve):
+        self.tempo_curve = curve
+
+    def on_key_segments(self, segments):
+        self.key_segments = segments
+
+    def refresh_chords(self):
+        # Whenever the detected chords or the beats change: snap chord changes to
+        # the beat grid, then rebuild the lookup arrays and bars from the result.
+        if len(self.beats):
+            self.chords = quantize_chords(self.detected_chords, self.beats)
+        else:
+            self.chords = self.detected_chords
+        self.chord_starts, self.chord_ends = chord_bounds(self.chords)
+        self.bars = chords_per_bar(self.chords, self.beats) if len(self.beats) else []
+        self.bar_starts = [start for start, _, _ in self.bars]
+        if self.player.state() == self.player.PlayingState:
+            # A streamed block may have added the chord that is playing right now.
+            self.update_chords(self.player.position())
+
+    def on_chord_segments(self, segments):
+        # Streaming mode: the first committed block is enough to start playing.
+        self.detected_chords.extend(segments)
+        self.refresh_chords()
+        if self.ui.appStacks.currentIndex() != 0:
+            self.show_player()
+
     def on_chords_recognized(self, chords):
-        self.chords = chords
+        self.detected_chords = chords
+        self.refresh_chords()
+        if self.ui.appStacks.currentIndex() != 0:
+            self.show_player()
+
+    def show_player(self):
         self.ui.appStacks.setCurrentIndex(0)
         self.ui.errGif.stop()
         self.ui.loadingGif.stop()
@@ -529,6 +755,34 @@ class MainWindow(QMainWindow):
             self.ui.keyLabel.setText(key)
         self.ui.keyLabel.show()
 
+    def on_analysis_error(self, message):
+        logging.getLogger(__name__).error("Analysis of %s failed: %s", self.audio_file, message)
+        if self.ui.appStacks.currentIndex() != 0:
+            # Nothing to play along with; leave the loading page.
+            self.ui.appStacks.setCurrentIndex(0)
+            self.ui.errGif.stop()
+            self.ui.loadingGif.stop()
+        QMessageBox.warning(self, "Analysis Failed", f"Could not analyze {self.media_title}:\n{message}")
+
+    def on_timings(self, timings):
+        self.track_timings.update(timings)
+
+    def show_timings(self):
+        """Per-stage timing breakdown of the current track (toggles timing on first use)."""
+        if not timing.enabled:
+            timing.enabled = True
+            QMessageBox.information(self, "Analysis Timings",
+                                    "Stage timing is now on; open a track to see its breakdown.")
+            return
+        if not self.track_timings:
+            QMessageBox.information(self, "Analysis Timings", "No timings recorded for this track yet.")
+            return
+        lines = []
+        for kind, stages in self.track_timings.items():
+            lines.append(f"{kind}: {sum(stages.values()):.3f} s")
+            lines.extend(f"    {name}: {seconds:.3f} s" for name, seconds in stages.items())
+        QMessageBox.information(self, "Analysis Timings", "\n".join(lines))
+
     def export_chords(self):
         if self.chords:
             os.makedirs('./export', exist_ok=True)
@@ -537,6 +791,9 @@ class MainWindow(QMainWindow):
                 for chord in self.chords:
                     start_time, end_time, chord_label = chord
                     file.write(f"({self.format_time(start_time)} - {self.format_time(end_time)}): {chord_label}\n")
+            if self.bars:
+                with open(f"./export/{self.media_title}_bars.txt", 'w') as file:
+                    file.write(format_bar_chart(self.bars) + "\n")
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -572,6 +829,10 @@ class MainWindow(QMainWindow):
             self.ui.mediaOpenBtn.click()
         if event.key() == Qt.Key_E:
             self.ui.saveChordsBtn.click()
+        if event.key() == Qt.Key_L:
+            self.toggle_live()
+        if event.key() == Qt.Key_I:
+            self.show_timings()
 
     def format_time(self, s):
         seconds = s % 60
@@ -582,6 +843,16 @@ class MainWindow(QMainWindow):
         else:
             return "%02d:%02d" % (minutes, round(seconds))
     
+    def closeEvent(self, event):
+        if self.live_thread is not None:
+            self.live_thread.stop()
+        self.cancel_analysis()
+        self.executor.shutdown(wait=False)
+        clear_playing()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        super().closeEvent(event)
+
     def go_back_to_menu(self):
         try:
             current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -599,6 +870,7 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = handle_exception
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
     app = QApplication(sys.argv)
     app.setStyleSheet(dark_theme)
     window = MainWindow()
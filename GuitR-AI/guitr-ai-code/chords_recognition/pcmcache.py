@@ -0,0 +1,102 @@
+"""Decoded mono float32 PCM, cached as memory-mapped .npy files.
+
+Shared by chords_recognition (madmom, 44.1 kHz) and track_separation's
+data prep (librosa, 22.05 kHz). Entries are keyed on the audio content
+digest and the sample rate; each consumer passes its own decoder, so a
+hit returns exactly the samples it would have decoded itself. Neither
+madmom nor librosa is imported here, so either side can use it.
+
+The cache has its own size budget (GUITR_PCM_CACHE_MAX_BYTES), separate
+from the analysis results.
+"""
+import os
+import threading
+
+import numpy as np
+
+from cache import default_cache
+from cache_manager import CacheManager
+from config import PCM_CACHE_DIR, PCM_CACHE_ENABLED, PCM_CACHE_MAX_BYTES
+from lease import Lease, wait_released
+
+
+class PCMCache:
+    """decode(audio_path, sample_rate) results by content digest and rate."""
+
+    def __init__(self, root=PCM_CACHE_DIR, analysis_cache=None, max_bytes=PCM_CACHE_MAX_BYTES):
+        self.root = root
+        # The analysis cache supplies the digest index.
+        self.analysis_cache = analysis_cache or default_cache()
+        self.manager = CacheManager(root, max_bytes)
+
+    def entry_path(self, audio_path, sample_rate):
+        digest = self.analysis_cache.digest(audio_path)
+        return os.path.join(self.root, f"{digest}-{sample_rate}.npy")
+
+    def get(self, audio_path, sample_rate):
+        """The cached samples, memory-mapped read-only, or None."""
+        path = self.entry_path(audio_path, sample_rate)
+        try:
+            samples = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        os.utime(path)  # last-hit time, for LRU eviction
+        return samples
+
+    def put(self, audio_path, sample_rate, samples):
+        path = self.entry_path(audio_path, sample_rate)
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(samples, dtype=np.float32))
+        os.replace(tmp_path, path)
+        self.manager.prune()
+
+    def load(self, audio_path, sample_rate, decode):
+        """Samples of audio_path at sample_rate, decoding only on a miss."""
+        samples = self.get(audio_path, sample_rate)
+        if samples is not None:
+            return samples
+        lease_path = self.entry_path(audio_path, sample_rate) + ".lease"
+        os.makedirs(self.root, exist_ok=True)
+        lease = Lease.acquire(lease_path)
+        if lease is None:
+            # Someone else is decoding this file right now.
+            wait_released(lease_path)
+            samples = self.get(audio_path, sample_rate)
+            if samples is not None:
+                return samples
+            return np.asarray(decode(audio_path, sample_rate), dtype=np.float32)
+        with lease:
+            samples = np.asarray(decode(audio_path, sample_rate), dtype=np.float32)
+            self.put(audio_path, sample_rate, samples)
+        # Prefer the memory-mapped copy; a track larger than the whole budget
+        # is evicted again right away, and then the decoded samples will do.
+        cached = self.get(audio_path, sample_rate)
+        return cached if cached is not None else samples
+
+
+_default_pcm_cache = None
+_default_lock = threading.Lock()
+
+
+def default_pcm_cache():
+    global _default_pcm_cache
+    with _default_lock:
+        if _default_pcm_cache is None:
+            _default_pcm_cache = PCMCache()
+        return _default_pcm_cache
+
+
+def load_pcm(audio_path, sample_rate, decode):
+    """decode(audio_path, sample_rate) through the PCM cache when it is enabled."""
+    if not PCM_CACHE_ENABLED:
+        return np.asarray(decode(audio_path, sample_rate), dtype=np.float32)
+    return default_pcm_cache().load(audio_path, sample_rate, decode)
+
+
+def cached_pcm(audio_path, sample_rate):
+    """Already cached samples, or None (also when the PCM cache is off)."""
+    if not PCM_CACHE_ENABLED:
+        return None
+    return default_pcm_cache().get(audio_path, sample_rate)
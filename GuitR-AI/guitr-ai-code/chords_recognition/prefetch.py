@@ -0,0 +1,240 @@
+"""Analyze new files in watched folders ahead of time, at idle priority.
+
+    python prefetch.py ~/Music/Lessons ~/Downloads --interval 60
+    python prefetch.py --once            # folders from GUITR_WATCH_DIRS
+
+The GUI starts this in its own process when GUITR_WATCH_DIRS is set.
+Results go into the shared cache, so opening a prefetched file is a
+cache hit. When any GUI instance starts playing audio, the prefetcher
+drops what it is analyzing at the next stage boundary, releasing its
+leases, and starts that file again once playback stops.
+"""
+import compat  # must run before madmom is imported
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+
+from batch import find_audio_files
+from cache import AnalysisCache
+from cancellation import Cancelled
+from config import CACHE_DIR, PREFETCH_INTERVAL, WATCH_DIRS
+from engine import AnalysisEngine
+
+logger = logging.getLogger("guitr.prefetch")
+
+# Touched by a playing GUI; playback counts as stopped once it goes stale,
+# so a crashed GUI can't pause the prefetcher forever.
+PLAYING_FILE = "playing"
+PLAYING_HEARTBEAT = 2.0
+PLAYING_STALE = 3 * PLAYING_HEARTBEAT
+# How long closing the GUI waits for the prefetcher to reach a stage
+# boundary; the interpreter joins it at exit if it needs longer.
+STOP_TIMEOUT = 2.0
+
+_last_heartbeat = 0.0
+
+
+def mark_playing(cache_root=CACHE_DIR):
+    """Called by the GUI while it plays; cheap to call on every position tick."""
+    global _last_heartbeat
+    now = time.monotonic()
+    if now - _last_heartbeat < PLAYING_HEARTBEAT:
+        return
+    _last_heartbeat = now
+    os.makedirs(cache_root, exist_ok=True)
+    with open(os.path.join(cache_root, PLAYING_FILE), "a"):
+        pass
+    os.utime(os.path.join(cache_root, PLAYING_FILE))
+
+
+def clear_playing(cache_root=CACHE_DIR):
+    global _last_heartbeat
+    _last_heartbeat = 0.0
+    try:
+        os.remove(os.path.join(cache_root, PLAYING_FILE))
+    except OSError:
+        pass
+
+
+def gui_is_playing(cache_root=CACHE_DIR):
+    try:
+        return time.time() - os.path.getmtime(os.path.join(cache_root, PLAYING_FILE)) < PLAYING_STALE
+    except OSError:
+        return False
+
+
+def lower_priority():
+    """Drop this process to idle CPU priority so it only uses spare cycles."""
+    if hasattr(os, "nice"):
+        os.nice(19)
+    elif sys.platform == "win32":
+        import ctypes
+        IDLE_PRIORITY_CLASS = 0x40
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), IDLE_PRIORITY_CLASS)
+
+
+class PrefetchToken:
+    """Cancel token for the prefetcher's analyses.
+
+    The engine checks it at every stage boundary. check() raises Cancelled
+    once the prefetcher is told to stop or the GUI that started it is gone,
+    and also while a GUI is playing: the engine then releases its leases, so
+    a GUI opening the same file computes it instead of waiting on a pass
+    that is paused until playback ends.
+    """
+
+    def __init__(self, cache_root=CACHE_DIR, stop_event=None):
+        self.cache_root = cache_root
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
+        self.parent = multiprocessing.parent_process()
+
+    def cancel(self):
+        self.stop_event.set()
+
+    @property
+    def cancelled(self):
+        return self.stop_event.is_set() or (self.parent is not None and not self.parent.is_alive())
+
+    def wait(self, timeout):
+        """Sleep for timeout seconds, waking early if cancelled."""
+        self.stop_event.wait(timeout)
+
+    def wait_while_playing(self):
+        """Block while a GUI is playing; False if cancelled meanwhile."""
+        while not self.cancelled and gui_is_playing(self.cache_root):
+            self.wait(PLAYING_HEARTBEAT)
+        return not self.cancelled
+
+    def check(self):
+        if self.cancelled or gui_is_playing(self.cache_root):
+            raise Cancelled()
+
+
+class Prefetcher:
+    """Polls the watched folders and fills the cache for new or changed files."""
+
+    def __init__(self, roots, cache_root=CACHE_DIR, interval=PREFETCH_INTERVAL, stop_event=None):
+        self.roots = roots
+        self.cache_root = cache_root
+        self.interval = interval
+        self.engine = AnalysisEngine(AnalysisCache(cache_root))
+        self.token = PrefetchToken(cache_root, stop_event)
+        self.seen = {}
+
+    @property
+    def running(self):
+        return not self.token.cancelled
+
+    def scan(self):
+        """Files that are new or changed since the last scan."""
+        changed = []
+        for path in find_audio_files(self.roots):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            if self.seen.get(path) != stamp:
+                self.seen[path] = stamp
+                changed.append(path)
+        return changed
+
+    def prefetch(self, audio_path):
+        # One analyze call, so the file is decoded once. Playback cancels it;
+        # the retry gets whatever was cached before that from the cache.
+        while self.token.wait_while_playing():
+            try:
+                result = self.engine.analyze(audio_path, token=self.token)
+            except Cancelled:
+                continue
+            if result.computed:
+                logger.info("prefetched %s (%s)", audio_path, ", ".join(result.computed))
+            return
+
+    def run_once(self):
+        for audio_path in self.scan():
+            if not self.running:
+                return
+            try:
+                self.prefetch(audio_path)
+            except Exception:
+                # Not retried until the file changes on disk.
+                logger.exception("prefetch failed for %s", audio_path)
+        self.engine.cache.flush_stats()
+
+    def run(self):
+        while self.running:
+            self.run_once()
+            self.token.wait(self.interval)
+
+    def stop(self):
+        self.token.cancel()
+
+
+def run_prefetcher(roots, cache_root=CACHE_DIR, interval=PREFETCH_INTERVAL, stop_event=None):
+    """Process entry point used by the GUI."""
+    logging.basicConfig(level=logging.INFO)
+    lower_priority()
+    Prefetcher(roots, cache_root, interval, stop_event).run()
+
+
+class PrefetchProcess:
+    """The GUI's handle on a prefetcher running in its own process."""
+
+    def __init__(self, roots, cache_root=CACHE_DIR):
+        # Spawn, not fork: the GUI process has Qt and model threads running.
+        context = multiprocessing.get_context("spawn")
+        self.stop_event = context.Event()
+        # Not a daemon: daemons are terminated at exit, possibly mid-write.
+        # It is asked to stop instead, and exits by itself if the GUI dies.
+        self.process = context.Process(
+            target=run_prefetcher,
+            args=(roots, cache_root, PREFETCH_INTERVAL, self.stop_event),
+        )
+        self.process.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Ask the prefetcher to stop at its next stage boundary and wait for it."""
+        self.stop_event.set()
+        self.process.join(timeout)
+
+
+def start_prefetcher(roots=None, cache_root=CACHE_DIR):
+    """Start the prefetcher in its own process; None if no folders are configured."""
+    roots = roots or WATCH_DIRS
+    if not roots:
+        return None
+    return PrefetchProcess(roots, cache_root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roots", nargs="*", default=WATCH_DIRS,
+                        help="folders to watch (default: GUITR_WATCH_DIRS)")
+    parser.add_argument("--interval", type=float, default=PREFETCH_INTERVAL,
+                        help="seconds between rescans")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache directory to fill")
+    parser.add_argument("--once", action="store_true", help="scan once and exit")
+    args = parser.parse_args()
+    if not args.roots:
+        parser.error("no folders given and GUITR_WATCH_DIRS is not set")
+
+    logging.basicConfig(level=logging.INFO)
+    lower_priority()
+    prefetcher = Prefetcher(args.roots, args.cache_dir, args.interval)
+    try:
+        if args.once:
+            prefetcher.run_once()
+        else:
+            prefetcher.run()
+    except KeyboardInterrupt:
+        prefetcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import madmom
+from madmom.audio.comb_filters import CombFilterbankProcessor
+from madmom.audio.signal import Signal
+from madmom.features.beats import DBNBeatTrackingProcessor, RNNBeatProcessor
+from madmom.features.tempo import TempoEstimationProcessor
+
+from config import CHORD_BACKEND, PCM_CACHE_ENABLED
+from pcmcache import load_pcm
+
+
+def _chord_features():
+    if CHORD_BACKEND == "float32":
+        from chordnet import FastChordFeatureProcessor
+        return FastChordFeatureProcessor()
+    return madmom.features.chords.CNNChordFeatureProcessor()
+
+
+# name -> factory. Constructing these loads the model weights from disk,
+# so each one is built once per process and reused for every track.
+FACTORIES = {
+    "chord_features": _chord_features,
+    "chord_crf": madmom.features.chords.CRFChordRecognitionProcessor,
+    "key": madmom.features.key.CNNKeyRecognitionProcessor,
+    "beats": RNNBeatProcessor,
+    "beat_dbn": lambda: DBNBeatTrackingProcessor(fps=100),
+    "tempo": lambda: TempoEstimationProcessor(fps=200),
+    # 40-250 BPM at the 100 fps of the beat activations, as madmom's comb tempo histogram.
+    "tempo_comb": lambda: CombFilterbankProcessor("backward", np.arange(24, 151), 0.79),
+}
+
+# Recurrent layers keep their hidden state on the layer object while
+# processing, so these may only run one signal at a time. The others are
+# feed-forward and safe to call from several threads at once.
+STATEFUL = {"beats"}
+
+# The chord, key and beat networks all expect 44.1 kHz mono input, so one
+# decoded Signal at this rate can be handed to every processor unchanged.
+SAMPLE_RATE = 44100
+
+_processors = {}
+_locks = {name: threading.Lock() for name in FACTORIES}
+_registry_lock = threading.Lock()
+
+
+def get_processor(name):
+    processor = _processors.get(name)
+    if processor is None:
+        with _registry_lock:
+            processor = _processors.get(name)
+            if processor is None:
+                processor = FACTORIES[name]()
+                _processors[name] = processor
+    return processor
+
+
+@contextmanager
+def use_processor(name):
+    """Borrow the shared processor, serialized if it is stateful."""
+    processor = get_processor(name)
+    if name not in STATEFUL:
+        yield processor
+        return
+    with _locks[name]:
+        yield processor
+
+
+def preload(names=None):
+    """Load every model up front, e.g. at app start or in a pool initializer."""
+    for name in names or FACTORIES:
+        get_processor(name)
+
+
+def decode_pcm(audio_path, sample_rate=SAMPLE_RATE):
+    """Mono float32 samples as madmom decodes them, for the PCM cache."""
+    signal = Signal(audio_path, sample_rate=sample_rate, num_channels=1)
+    if np.issubdtype(signal.dtype, np.integer):
+        # madmom's STFT divides integer input by the dtype's max, so this
+        # scaling gives the processors exactly the same spectra.
+        return np.asarray(signal, dtype=np.float32) / np.iinfo(signal.dtype).max
+    return np.asarray(signal, dtype=np.float32)
+
+
+def load_signal(audio):
+    """Decode a file path into the Signal the processors expect; pass Signals through."""
+    if isinstance(audio, np.ndarray):
+        return audio
+    if PCM_CACHE_ENABLED:
+        return Signal(load_pcm(audio, SAMPLE_RATE, decode_pcm), sample_rate=SAMPLE_RATE, num_channels=1)
+    return Signal(audio, sample_rate=SAMPLE_RATE, num_channels=1)
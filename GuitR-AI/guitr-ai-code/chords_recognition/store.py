@@ -0,0 +1,181 @@
+"""SQLite store behind the analysis cache.
+
+One database file in the cache root holds every analysis result, keyed on
+(content digest, kind, config), next to the path -> digest index and the
+hit/miss counters. It runs in WAL mode: readers never block the writer,
+every write is a single transaction, and a crash can never leave half an
+entry behind. The GUI, worker processes and the prefetcher all open the
+same file; each thread gets its own connection.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+STORE_FILE = "analysis.sqlite3"
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT = 30.0           # seconds to wait for another process's write transaction
+# Hits only read; their last-hit times are written back in one transaction
+# once this many are pending or this many seconds have passed.
+HIT_FLUSH_COUNT = 64
+HIT_FLUSH_INTERVAL = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    config TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_hit REAL NOT NULL,
+    PRIMARY KEY (digest, kind, config)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_last_hit ON results (last_hit);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class AnalysisStore:
+    """Analysis results, the digest index and counters in one WAL database."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._hits_lock = threading.Lock()
+        self._pending_hits = {}       # (digest, kind, config) -> last-hit time
+        self._hits_flushed = time.monotonic()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL keeps committed transactions atomic at NORMAL; only the last
+            # few may be lost on power failure, which just means a re-analysis.
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                with conn:
+                    conn.executescript(SCHEMA)
+                    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            self._local.conn = conn
+        return conn
+
+    # -- path -> digest index
+
+    def lookup_digest(self, path, mtime_ns, size):
+        """The digest recorded for path, if the file still has this mtime and size."""
+        row = self._connect().execute(
+            "SELECT digest FROM files WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size),
+        ).fetchone()
+        return row[0] if row else None
+
+    def remember_digests(self, rows):
+        """Record (path, mtime_ns, size, digest) rows."""
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", rows)
+
+    # -- results
+
+    def get(self, digest, kind, config):
+        """The stored blob, or None. A hit is a pure read; its last-hit time
+        is queued and written later by flush_hits()."""
+        row = self._connect().execute(
+            "SELECT value FROM results WHERE digest = ? AND kind = ? AND config = ?",
+            (digest, kind, config),
+        ).fetchone()
+        if row is None:
+            return None
+        with self._hits_lock:
+            self._pending_hits[(digest, kind, config)] = time.time()
+            due = (len(self._pending_hits) >= HIT_FLUSH_COUNT
+                   or time.monotonic() - self._hits_flushed >= HIT_FLUSH_INTERVAL)
+        if due:
+            self.flush_hits()
+        return row[0]
+
+    def flush_hits(self):
+        """Write the queued last-hit times in a single transaction."""
+        with self._hits_lock:
+            pending, self._pending_hits = self._pending_hits, {}
+            self._hits_flushed = time.monotonic()
+        if not pending:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE results SET last_hit = MAX(last_hit, ?) WHERE digest = ? AND kind = ? AND config = ?",
+                [(hit,) + key for key, hit in pending.items()],
+            )
+
+    def contains(self, digest, kind, config):
+        return self._connect().execute(
+            "SELECT 1 FROM results WHERE digest = ? AND kind = ? AND config = ?",
+            (digest, kind, config),
+        ).fetchone() is not None
+
+    def put(self, digest, kind, config, blob):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, kind, config, sqlite3.Binary(blob), len(blob), now, now),
+            )
+
+    def entries(self):
+        """((digest, kind, config), kind, size, last_hit) for every result."""
+        return list(self.oldest_first())
+
+    def oldest_first(self):
+        """Like entries(), lazily and least recently hit first (uses the index)."""
+        for digest, kind, config, size, last_hit in self._connect().execute(
+                "SELECT digest, kind, config, size, last_hit FROM results ORDER BY last_hit"):
+            yield (digest, kind, config), kind, size, last_hit
+
+    def total_size(self):
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def kind_totals(self):
+        """kind -> (entries, bytes)."""
+        return {
+            kind: (count, size) for kind, count, size in self._connect().execute(
+                "SELECT kind, COUNT(*), SUM(size) FROM results GROUP BY kind")
+        }
+
+    def delete(self, keys):
+        """Remove the results with these (digest, kind, config) keys."""
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM results WHERE digest = ? AND kind = ? AND config = ?", keys)
+
+    # -- counters
+
+    def add_counters(self, **deltas):
+        with self._connect() as conn:
+            for name, delta in deltas.items():
+                conn.execute("INSERT OR IGNORE INTO counters VALUES (?, 0)", (name,))
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def counters(self):
+        return dict(self._connect().execute("SELECT name, value FROM counters"))
+
+    def clear(self):
+        """Drop every result, index row and counter, and give the space back."""
+        with self._hits_lock:
+            self._pending_hits = {}
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM counters")
+        conn.execute("VACUUM")
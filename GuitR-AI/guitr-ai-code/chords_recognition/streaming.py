@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from cache import default_cache
+from cancellation import CancelToken, Cancelled
+from chords import CHORD_CONFIG, format_chord_label
+from config import CHORD_BACKEND
+from processors import SAMPLE_RATE, load_signal, use_processor
+from timing import NULL_TIMER, new_timer
+
+# Streamed results can differ slightly from a whole-file decode near block
+# edges, so they get their own cache key; whole-file results still win.
+STREAM_CONFIG = "madmom-cnn-crf-stream:block=20:context=2:v2"
+if CHORD_BACKEND != "madmom":
+    STREAM_CONFIG = STREAM_CONFIG.replace(":v2", f":{CHORD_BACKEND}:v2")
+
+FPS = 10                      # frame rate of the chord CNN features
+HOP = SAMPLE_RATE // FPS
+BLOCK_FRAMES = 20 * FPS       # new audio analyzed per block
+CONTEXT_FRAMES = 2 * FPS      # extra audio on each side for the CNN's receptive field
+SETTLE_FRAMES = 3 * FPS       # segments ending closer than this to the edge stay open
+
+
+def iter_chord_blocks(signal, timer=NULL_TIMER):
+    """Recognize chords in a decoded Signal block by block, yielding (new segments, seconds done).
+
+    Only segments that can no longer change are yielded: the CRF is re-run
+    from the last committed boundary over all features seen so far, and a
+    segment is committed once it ends SETTLE_FRAMES before the analyzed
+    edge. The final block commits everything that is left.
+
+    A re-run can split one chord at the commit boundary, so the last
+    committed segment is held back until the next one shows a different
+    label; the two halves are merged rather than yielded separately.
+    """
+    features = []
+    commit_frame = 0
+    block_start = 0
+    held = None
+    while True:
+        lo = max(0, block_start - CONTEXT_FRAMES)
+        wanted_hi = block_start + BLOCK_FRAMES + CONTEXT_FRAMES
+        chunk = signal[lo * HOP:wanted_hi * HOP]
+        available = lo + math.ceil(len(chunk) / HOP)
+        final = available < wanted_hi
+        block_end = available if final else block_start + BLOCK_FRAMES
+        if block_end > block_start:
+            with timer.stage("cnn_features"), use_processor("chord_features") as feat_processor:
+                block_feats = feat_processor(chunk)
+            features.append(block_feats[block_start - lo:block_end - lo])
+
+        new_segments = []
+        pending = np.concatenate(features)[commit_frame:] if features else []
+        if len(pending):
+            with timer.stage("crf_decode"), use_processor("chord_crf") as recog_processor:
+                segments = recog_processor(pending)
+            offset = commit_frame / FPS
+            committed = []
+            for start_time, end_time, chord_label in segments:
+                end_frame = commit_frame + round(end_time * FPS)
+                if not final and end_frame > block_end - SETTLE_FRAMES:
+                    break
+                committed.append((offset + float(start_time), offset + float(end_time),
+                                  format_chord_label(chord_label)))
+            if committed:
+                commit_frame = round(committed[-1][1] * FPS)
+            for segment in committed:
+                if held is not None and held[2] == segment[2]:
+                    held = (held[0], segment[1], held[2])
+                else:
+                    if held is not None:
+                        new_segments.append(held)
+                    held = segment
+        if final and held is not None:
+            new_segments.append(held)
+        yield new_segments, block_end / FPS
+        if final:
+            return
+        block_start = block_end
+
+
+class StreamingChordThread(QThread):
+    """Emits chord segments as blocks are analyzed instead of at the very end."""
+    segments = pyqtSignal(list)     # newly committed segments, in order
+    progress = pyqtSignal(float)    # seconds of audio analyzed so far
+    result = pyqtSignal(object)     # the complete chord list
+    timings = pyqtSignal(dict)
+
+    def __init__(self, audio_path):
+        super().__init__()
+        self.audio_path = audio_path
+        self.token = CancelToken()
+
+    def cancel(self):
+        """Stop before the next block; nothing is cached or emitted after that."""
+        self.token.cancel()
+
+    def run(self):
+        try:
+            self.analyze()
+        except Cancelled:
+            pass
+        self.quit()
+
+    def analyze(self):
+        cache = default_cache()
+        timer = new_timer("chord", self.audio_path, self.token)
+        for config in (CHORD_CONFIG, STREAM_CONFIG):
+            with timer.stage("cache_lookup"):
+                cached_chords = cache.get("chord", self.audio_path, config)
+            if cached_chords is not None:
+                self.result.emit(cached_chords)
+                self.report(timer)
+                return
+
+        lease = cache.try_lease("chord", self.audio_path, STREAM_CONFIG)
+        if lease is None:
+            # Another app instance is streaming this file; take its result.
+            with timer.stage("lease_wait"):
+                cached_chords = cache.wait_for("chord", self.audio_path, STREAM_CONFIG, self.token)
+            if cached_chords is not None:
+                self.result.emit(cached_chords)
+                self.report(timer)
+                return
+            lease = cache.try_lease("chord", self.audio_path, STREAM_CONFIG)
+
+        try:
+            # One decode, sliced into blocks. With the PCM cache on, whichever
+            # of this thread and the executor job gets there first decodes the
+            # file and the other maps its result.
+            with timer.stage("decode"):
+                signal = load_signal(self.audio_path)
+            chords = []
+            for new_segments, seconds_done in iter_chord_blocks(signal, timer):
+                if new_segments:
+                    chords.extend(new_segments)
+                    self.segments.emit(new_segments)
+                self.progress.emit(seconds_done)
+            with timer.stage("cache_write"):
+                cache.put("chord", self.audio_path, STREAM_CONFIG, chords)
+        finally:
+            if lease is not None:
+                lease.release()
+        self.result.emit(chords)
+        self.report(timer)
+
+    def report(self, timer):
+        if timer.stages:
+            timer.log()
+            self.timings.emit({"chord": timer.stages})
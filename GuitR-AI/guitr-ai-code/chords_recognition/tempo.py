@@ -1,47 +1,143 @@
-import os
-import hashlib
+import numpy as np
 from PyQt5.QtCore import QThread, pyqtSignal
-from madmom.features.beats import RNNBeatProcessor
-from madmom.features.tempo import TempoEstimationProcessor
+from madmom.audio.signal import smooth as smooth_signal
+
+from cache import default_cache
+from processors import load_signal, use_processor
+from timing import NULL_TIMER, new_timer
+
+# Part of the cache key: bump it whenever the tempo pipeline changes.
+TEMPO_CONFIG = "madmom-rnn-beats:fps=200:fold=70-190:v1"
+BEATS_CONFIG = "madmom-rnn-beats:dbn:fps=100:v1"
+CURVE_CONFIG = "madmom-rnn-beats:comb:window=8:hop=1:fold=70-190:v1"
+
+MIN_BPM, MAX_BPM = 70, 190
+ACTIVATION_FPS = 100          # frame rate of the beat RNN activations
+CURVE_HOP = 1                 # seconds between tempo curve points
+CURVE_WINDOW = 8              # seconds of activations behind each point
+
+def adjust_tempo(tempo):
+    while tempo < MIN_BPM:
+        tempo *= 2
+    while tempo > MAX_BPM:
+        tempo /= 2
+    return tempo
+
+def fold_tempi(tempi):
+    """adjust_tempo for an array of tempi at once."""
+    up = np.clip(np.ceil(np.log2(MIN_BPM / tempi)), 0, None)
+    down = np.clip(np.ceil(np.log2(tempi / MAX_BPM)), 0, None)
+    return tempi * 2.0 ** (up - down)
+
+def beat_activations(signal, timer=NULL_TIMER):
+    """RNN beat activations (100 fps) of a decoded Signal.
+
+    The result is kept on the Signal, so the tempo and beat grid analyses of
+    one decode share a single pass of the beat network. The processor lock
+    makes a concurrent caller wait for that pass instead of repeating it.
+    """
+    with timer.stage("beat_rnn"), use_processor("beats") as beat_processor:
+        activations = getattr(signal, "beat_activations", None)
+        if activations is None:
+            activations = beat_processor(signal)
+            try:
+                signal.beat_activations = activations
+            except AttributeError:
+                pass  # a plain ndarray was passed in; nothing to share with
+    return activations
+
+def detect_tempo(audio, timer=NULL_TIMER):
+    """Rounded tempo in BPM for a file path or a decoded Signal, None if no tempo was found."""
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    activations = beat_activations(signal, timer)
+    with timer.stage("tempo_histogram"), use_processor("tempo") as tempo_processor:
+        tempos = tempo_processor(activations)
+    if not len(tempos):
+        return None
+    return round(adjust_tempo(tempos[0][0]))
+
+def track_beats(audio, timer=NULL_TIMER):
+    """Beat times in seconds (float32) from DBN tracking over the shared activations."""
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    activations = beat_activations(signal, timer)
+    with timer.stage("beat_dbn"), use_processor("beat_dbn") as dbn_processor:
+        beats = dbn_processor(activations)
+    return np.asarray(beats, dtype=np.float32)
+
+def tempo_curve(audio, timer=NULL_TIMER):
+    """Tempo over time as float32 rows of (window centre in seconds, BPM).
+
+    The shared beat activations are comb-filtered once. As in madmom's comb
+    histogram, every frame votes for its strongest comb; the votes are summed
+    into CURVE_HOP blocks, and each window's histogram is a difference of
+    cumulative block sums. Windows without any beat energy get NaN.
+    """
+    with timer.stage("decode"):
+        signal = load_signal(audio)
+    activations = beat_activations(signal, timer)
+    if not len(activations):
+        return None
+    with timer.stage("tempo_curve"), use_processor("tempo_comb") as comb_processor:
+        taus = np.asarray(comb_processor.tau)
+        filtered = comb_processor(smooth_signal(activations, int(round(ACTIVATION_FPS * 0.14))))
+        frames = np.arange(len(filtered))
+        strongest = filtered.argmax(axis=1)
+        block = frames // (CURVE_HOP * ACTIVATION_FPS)
+        num_blocks = block[-1] + 1
+        votes = np.bincount(block * len(taus) + strongest, weights=filtered[frames, strongest],
+                            minlength=num_blocks * len(taus)).reshape(num_blocks, len(taus))
+        window = min(CURVE_WINDOW // CURVE_HOP, num_blocks)
+        cumulative = np.concatenate((np.zeros((1, len(taus))), np.cumsum(votes, axis=0)))
+        histograms = cumulative[window:] - cumulative[:-window]
+        histograms = smooth_signal(histograms.T, 9).T
+        tempi = fold_tempi(60.0 * ACTIVATION_FPS / taus[histograms.argmax(axis=1)])
+        tempi[histograms.max(axis=1) <= 0] = np.nan
+        centres = (np.arange(len(histograms)) + window / 2) * CURVE_HOP
+    return np.column_stack((centres, tempi)).astype(np.float32)
+
+def tempo_at(curve, seconds):
+    """BPM of the tempo curve point nearest before seconds, None if unknown."""
+    if curve is None or not len(curve):
+        return None
+    index = max(int(np.searchsorted(curve[:, 0], seconds, side="right")) - 1, 0)
+    tempo = curve[index, 1]
+    return None if np.isnan(tempo) else round(float(tempo))
 
 class TempoDetectionThread(QThread):
     result = pyqtSignal(int)
+    timings = pyqtSignal(dict)
 
     def __init__(self, audio_file_path):
         super().__init__()
         self.audio_file_path = audio_file_path
 
     def run(self):
-        cache_dir = "cache/tempo/"
-        os.makedirs(cache_dir, exist_ok=True)
-        hash_object = hashlib.md5(self.audio_file_path.encode())
-        hashed_filename = hash_object.hexdigest() + ".txt"
-        cache_file = os.path.join(cache_dir, hashed_filename)
-
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                cached_tempo = int(f.read().strip())
+        cache = default_cache()
+        timer = new_timer("tempo", self.audio_file_path)
+        with timer.stage("cache_lookup"):
+            cached_tempo = cache.get("tempo", self.audio_file_path, TEMPO_CONFIG)
+        if cached_tempo is not None:
             self.result.emit(cached_tempo)
+            self.report(timer)
             self.quit()
             return
 
-        beat_processor = RNNBeatProcessor()
-        beats = beat_processor(self.audio_file_path)
-        tempo_processor = TempoEstimationProcessor(fps=200)
-        tempos = tempo_processor(beats)
-        if len(tempos):
-            top_tempo = tempos[0][0]
-            adjusted_tempo = self.adjust_tempo(top_tempo)
-            with open(cache_file, "w") as f:
-                f.write(str(round(adjusted_tempo)))
-            self.result.emit(round(adjusted_tempo))
+        tempo = detect_tempo(self.audio_file_path, timer)
+        if tempo is not None:
+            with timer.stage("cache_write"):
+                cache.put("tempo", self.audio_file_path, TEMPO_CONFIG, tempo)
+            self.result.emit(tempo)
         else:
             self.result.emit(0)
+        self.report(timer)
         self.quit()
 
     def adjust_tempo(self, tempo):
-        while tempo < 70:
-            tempo *= 2
-        while tempo > 190:
-            tempo /= 2
-        return tempo
+        return adjust_tempo(tempo)
+
+    def report(self, timer):
+        if timer.stages:
+            timer.log()
+            self.timings.emit({"tempo": timer.stages})
@@ -0,0 +1,22 @@
+import numpy as np
+
+from beatsync import chords_per_bar, quantize_chords
+
+BEATS = np.arange(0, 8.5, 0.5)  # 120 BPM
+
+
+def test_chord_change_slightly_off_a_beat_lands_on_it():
+    chords = [(0.0, 2.07, "C"), (2.07, 3.94, "G"), (3.94, 8.0, "Am")]
+    assert quantize_chords(chords, BEATS) == [(0.0, 2.0, "C"), (2.0, 4.0, "G"), (4.0, 8.0, "Am")]
+
+
+def test_chords_shorter_than_a_beat_are_absorbed():
+    chords = [(0.0, 1.98, "C"), (1.98, 2.1, "F"), (2.1, 4.0, "C")]
+    assert quantize_chords(chords, BEATS) == [(0.0, 4.0, "C")]
+
+
+def test_bars_use_the_snapped_chords():
+    chords = quantize_chords([(0.0, 1.93, "C"), (1.93, 8.0, "G")], BEATS)
+    bars = chords_per_bar(chords, BEATS)
+    assert bars[0] == (0.0, 2.0, ["C", "C", "C", "C"])
+    assert bars[1][2] == ["G", "G", "G", "G"]
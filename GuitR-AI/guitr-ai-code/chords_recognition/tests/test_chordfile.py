@@ -0,0 +1,42 @@
+import pytest
+
+from chordfile import (HEADER, MAGIC, VERSION, decode_chords, encode_chords, read_chords,
+                       read_text_chords, write_chords)
+
+CHORDS = [(0.0, 1.5, "C"), (1.5, 3.0, "A:min"), (3.0, 4.25, "C"), (4.25, 6.0, "N")]
+
+
+def test_file_round_trip(tmp_path):
+    path = str(tmp_path / "chords.gchd")
+    write_chords(path, CHORDS)
+    chords = read_chords(path)
+    assert list(chords) == CHORDS
+    assert chords[1:3] == CHORDS[1:3]
+
+
+def test_blob_round_trip_of_decoded_segments():
+    blob = encode_chords(CHORDS)
+    assert encode_chords(decode_chords(blob)) == blob
+
+
+def test_no_segments():
+    assert list(decode_chords(encode_chords([]))) == []
+
+
+def test_bad_magic_is_rejected():
+    blob = encode_chords(CHORDS)
+    with pytest.raises(ValueError):
+        decode_chords(b"XXXX" + blob[len(MAGIC):])
+
+
+def test_unknown_version_is_rejected():
+    blob = encode_chords(CHORDS)
+    _, _, count, label_bytes = HEADER.unpack_from(blob)
+    with pytest.raises(ValueError):
+        decode_chords(HEADER.pack(MAGIC, VERSION + 1, count, label_bytes) + blob[HEADER.size:])
+
+
+def test_text_format_still_reads(tmp_path):
+    path = tmp_path / "chords.txt"
+    path.write_text("0.0,1.5,C\n1.5,3.0,A:min\n")
+    assert read_text_chords(str(path)) == CHORDS[:2]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("madmom")
+
+from madmom.audio.signal import Signal
+from madmom.features.chords import CNNChordFeatureProcessor
+
+from chordnet import FastChordFeatureProcessor
+
+
+@pytest.fixture(scope="module")
+def stock():
+    return CNNChordFeatureProcessor()
+
+
+def test_matches_madmom_features(stock):
+    t = np.arange(4 * 44100) / 44100
+    # C major, then A minor
+    freqs = np.where(t[:, None] < 2, [261.63, 329.63, 392.0], [220.0, 261.63, 329.63])
+    signal = Signal((np.sin(2 * np.pi * freqs * t[:, None]).sum(axis=1) / 3).astype(np.float32),
+                    sample_rate=44100)
+    expected = stock(signal)
+    actual = FastChordFeatureProcessor(stock)(signal)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=1e-3, atol=1e-4)
+
+
+def test_unexpected_layout_fails_at_construction(stock):
+    class Changed:
+        processors = stock.processors[:6] + [lambda data: data, lambda data: data.max(axis=1)]
+
+    with pytest.raises(ValueError):
+        FastChordFeatureProcessor(Changed())
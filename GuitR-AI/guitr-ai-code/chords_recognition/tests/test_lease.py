@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+import pytest
+
+from cache import AnalysisCache
+from cancellation import CancelToken, Cancelled
+from lease import LEASE_TTL, Lease, wait_released
+
+
+def make_stale(path):
+    past = time.time() - 2 * LEASE_TTL
+    os.utime(path, (past, past))
+
+
+def test_only_one_holder_at_a_time(tmp_path):
+    path = str(tmp_path / "entry.lease")
+    lease = Lease.acquire(path)
+    assert lease is not None
+    assert Lease.acquire(path) is None
+    lease.release()
+    assert not os.path.exists(path)
+    Lease.acquire(path).release()
+
+
+def test_stale_lease_is_broken(tmp_path):
+    path = str(tmp_path / "entry.lease")
+    with open(path, "w"):
+        pass  # left behind by a crashed process
+    make_stale(path)
+    lease = Lease.acquire(path)
+    assert lease is not None
+    lease.release()
+    assert not os.path.exists(f"{path}.break")
+
+
+def test_release_leaves_a_lease_taken_over_after_a_stall(tmp_path):
+    path = str(tmp_path / "entry.lease")
+    stalled = Lease.acquire(path)
+    stalled._stop.set()  # e.g. the laptop went to sleep: no more renewals
+    make_stale(path)
+    successor = Lease.acquire(path)
+    assert successor is not None
+    stalled.release()
+    assert os.path.exists(path)
+    assert Lease.acquire(path) is None
+    successor.release()
+    assert not os.path.exists(path)
+
+
+def test_wait_released_returns_once_the_holder_lets_go(tmp_path):
+    path = str(tmp_path / "entry.lease")
+    lease = Lease.acquire(path)
+    threading.Timer(0.3, lease.release).start()
+    started = time.monotonic()
+    wait_released(path)
+    assert not os.path.exists(path)
+    assert time.monotonic() - started < LEASE_TTL
+
+
+def test_wait_released_can_be_cancelled(tmp_path):
+    path = str(tmp_path / "entry.lease")
+    lease = Lease.acquire(path)
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(Cancelled):
+        wait_released(path, token)
+    lease.release()
+
+
+def test_wait_for_returns_what_the_lease_holder_cached(tmp_path):
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF not really audio")
+    holder = AnalysisCache(str(tmp_path / "cache"))
+    waiter = AnalysisCache(str(tmp_path / "cache"))
+    lease = holder.try_lease("key", str(track), "test:v1")
+    assert lease is not None
+    assert waiter.try_lease("key", str(track), "test:v1") is None
+
+    def finish():
+        holder.put("key", str(track), "test:v1", "A minor")
+        lease.release()
+
+    threading.Timer(0.3, finish).start()
+    assert waiter.wait_for("key", str(track), "test:v1") == "A minor"
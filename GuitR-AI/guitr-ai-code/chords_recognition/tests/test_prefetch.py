@@ -0,0 +1,68 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("madmom")
+pytest.importorskip("PyQt5")
+
+from madmom.audio.signal import Signal
+
+import engine
+from cache import AnalysisCache
+from cancellation import Cancelled
+from engine import AnalysisEngine
+from prefetch import PrefetchToken, clear_playing, mark_playing
+
+
+def run(target, timeout=10):
+    """target() in a thread; its return value or exception, failing if it hangs."""
+    outcome = {}
+
+    def call():
+        try:
+            outcome["value"] = target()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "deadlocked"
+    return outcome
+
+
+def test_playback_makes_the_prefetcher_let_go_of_its_leases(tmp_path, monkeypatch):
+    root = str(tmp_path / "cache")
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF not really audio")
+    calls = []
+
+    def analyzer(signal, timer):
+        calls.append(signal)
+        if len(calls) == 1:
+            # A GUI starts playing while the prefetcher is mid-analysis.
+            mark_playing(root)
+        with timer.stage("work"):
+            return "C major"
+
+    monkeypatch.setattr(engine, "ANALYZERS", {"key": (analyzer, "test:v1", "Error")})
+    monkeypatch.setattr(AnalysisEngine, "decode",
+                        lambda self, path: Signal(np.zeros(4410, dtype=np.float32), sample_rate=44100))
+    prefetcher = AnalysisEngine(AnalysisCache(root))
+    gui = AnalysisEngine(AnalysisCache(root))
+    token = PrefetchToken(root)
+    try:
+        outcome = run(lambda: prefetcher.analyze(str(track), token=token))
+        assert isinstance(outcome.get("error"), Cancelled)
+
+        # The paused pass holds no lease, so the GUI computes the key itself.
+        outcome = run(lambda: gui.analyze(str(track)))
+        assert outcome["value"].key == "C major"
+        assert outcome["value"].computed == ["key"]
+    finally:
+        clear_playing(root)
+
+    # Once playback stops the prefetcher's retry is a cache hit.
+    assert token.wait_while_playing()
+    assert prefetcher.analyze(str(track), token=token).computed == []
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import time
+
+import store
+from cache import AnalysisCache
+from store import AnalysisStore
+
+KEY = ("d0", "key", "test:v1")
+
+
+def last_hit(analysis_store, key):
+    return {ref: hit for ref, _, _, hit in analysis_store.entries()}[key]
+
+
+def test_put_get_delete(tmp_path):
+    analysis_store = AnalysisStore(str(tmp_path / "analysis.sqlite3"))
+    assert analysis_store.get(*KEY) is None
+    analysis_store.put(*KEY, b"C major")
+    assert analysis_store.get(*KEY) == b"C major"
+    assert analysis_store.contains(*KEY)
+    assert analysis_store.total_size() == len(b"C major")
+    assert analysis_store.kind_totals() == {"key": (1, len(b"C major"))}
+    analysis_store.delete([KEY])
+    assert not analysis_store.contains(*KEY)
+
+
+def test_hits_are_written_back_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "HIT_FLUSH_COUNT", 3)
+    analysis_store = AnalysisStore(str(tmp_path / "analysis.sqlite3"))
+    keys = [(f"d{i}", "key", "test:v1") for i in range(3)]
+    for key in keys:
+        analysis_store.put(*key, b"A minor")
+    written = {key: last_hit(analysis_store, key) for key in keys}
+    time.sleep(0.01)
+
+    analysis_store.get(*keys[0])
+    analysis_store.get(*keys[1])
+    # A hit is a pure read until enough are queued.
+    assert {key: last_hit(analysis_store, key) for key in keys} == written
+    analysis_store.get(*keys[2])
+    assert all(last_hit(analysis_store, key) > written[key] for key in keys)
+
+
+def test_flush_hits_before_prune_keeps_recent_entries(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=0)
+    for i in range(4):
+        cache.store.put(f"d{i}", "key", "test:v1", b"x" * 100)
+        time.sleep(0.01)
+    cache.store.get("d0", "key", "test:v1")  # queued, not written yet
+    cache.manager.prune(250)
+    assert sorted(ref[0] for ref, _, _, _ in cache.store.entries()) == ["d0", "d3"]
+
+
+def test_file_entries_move_into_the_store(tmp_path):
+    root = str(tmp_path / "cache")
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF not really audio")
+    cache = AnalysisCache(root)
+    entry = cache.entry_path("key", cache.key("key", str(track), "test:v1"))
+    os.makedirs(os.path.dirname(entry))
+    with open(entry, "w") as f:
+        f.write("E minor")
+
+    assert cache.get("key", str(track), "test:v1") == "E minor"
+    assert not os.path.exists(entry)
+    assert cache.store.contains(cache.digest(str(track)), "key", "test:v1")
+
+
+def test_path_keyed_entries_are_adopted_only_if_newer_than_the_audio(tmp_path):
+    root = str(tmp_path / "cache")
+    fresh, stale = tmp_path / "fresh.wav", tmp_path / "stale.wav"
+    for track in (fresh, stale):
+        track.write_bytes(track.name.encode())
+    os.makedirs(os.path.join(root, "tempo"))
+    for track in (fresh, stale):
+        legacy = os.path.join(root, "tempo", hashlib.md5(str(track).encode()).hexdigest() + ".txt")
+        with open(legacy, "w") as f:
+            f.write("120")
+        if track is stale:
+            past = time.time() - 60
+            os.utime(legacy, (past, past))  # the audio changed after the entry was written
+    cache = AnalysisCache(root)
+
+    assert cache.get("tempo", str(fresh), "test:v1") == 120
+    assert cache.get("tempo", str(stale), "test:v1") is None
+    assert os.listdir(os.path.join(root, "tempo")) == []
+
+
+def test_text_chord_entries_are_converted(tmp_path):
+    root = str(tmp_path / "cache")
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF not really audio")
+    cache = AnalysisCache(root)
+    text_entry = cache.entry_path("chord", cache.key("chord", str(track), "test:v1"), ".txt")
+    os.makedirs(os.path.dirname(text_entry))
+    with open(text_entry, "w") as f:
+        f.write("0.0,1.5,C\n1.5,3.0,G\n")
+
+    assert list(cache.get("chord", str(track), "test:v1")) == [(0.0, 1.5, "C"), (1.5, 3.0, "G")]
+    assert not os.path.exists(text_entry)
+
+
+def test_json_index_and_stats_are_imported(tmp_path):
+    root = tmp_path / "cache"
+    root.mkdir()
+    track = tmp_path / "track.wav"
+    track.write_bytes(b"RIFF not really audio")
+    stat = os.stat(track)
+    (root / "index.json").write_text(json.dumps({str(track): [stat.st_mtime_ns, stat.st_size, "abc"]}))
+    (root / "stats.json").write_text(json.dumps({"hits": 5, "misses": 2}))
+    cache = AnalysisCache(str(root))
+
+    assert cache.digest(str(track)) == "abc"
+    assert cache.manager.read_counters() == {"hits": 5, "misses": 2}
+    assert not (root / "index.json").exists() and not (root / "stats.json").exists()
@@ -0,0 +1,67 @@
+import json
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+
+from config import TIMING_ENABLED
+
+logger = logging.getLogger("guitr.timing")
+
+# Flip at runtime (the GUI does on demand); checked when each analysis starts.
+enabled = TIMING_ENABLED
+
+
+class StageTimer:
+    """Accumulates wall time per named stage of one analysis."""
+
+    def __init__(self, kind, track, token=None):
+        self.kind = kind
+        self.track = track
+        self.token = token
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.token is not None:
+            self.token.check()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def log(self):
+        logger.info(json.dumps({
+            "event": "analysis_timing",
+            "kind": self.kind,
+            "track": self.track,
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "total": round(sum(self.stages.values()), 4),
+        }))
+
+
+class NullTimer:
+    """Stand-in used while timing is off: only checks the cancel token, if any."""
+    stages = {}
+    _context = nullcontext()
+
+    def __init__(self, token=None):
+        self.token = token
+
+    def stage(self, name):
+        if self.token is not None:
+            self.token.check()
+        return self._context
+
+    def log(self):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def new_timer(kind, track, token=None):
+    """Timer for one analysis; every stage boundary is also a cancellation point."""
+    if enabled:
+        return StageTimer(kind, track, token)
+    return NULL_TIMER if token is None else NullTimer(token)
@@ -1,8 +1,13 @@
 import os
+import sys
 import json
 import librosa
 import numpy as np
 
+# The decoded-audio cache lives with the chord recognizer and is shared with it.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chords_recognition"))
+from pcmcache import load_pcm
+
 def parse_jams_file(jams_file):
     """
     Manually parse a .jams file (JSON) and return chord annotations.
@@ -26,13 +31,19 @@ def parse_jams_file(jams_file):
 
 def extract_chroma(audio_path, sr=22050, hop_length=512):
     """
-    Loads an audio file with librosa and returns chroma features of shape (num_frames, 12).
+    Loads an audio file with librosa (through the shared decoded-audio cache when
+    GUITR_PCM_CACHE=1) and returns chroma features of shape (num_frames, 12).
     """
-    y, sr = librosa.load(audio_path, sr=sr)
-    chroma = librosa.feature.chroma_stft(y=y, sr=sr, hop_length=hop_length)
+    y = load_pcm(audio_path, sr, _librosa_decode)
+    chroma = librosa.feature.chroma_stft(y=np.asarray(y), sr=sr, hop_length=hop_length)
     return chroma.T
 
 
+def _librosa_decode(audio_path, sr):
+    y, _ = librosa.load(audio_path, sr=sr)
+    return y
+
+
 def create_frame_labels(chroma, annotations, sr=22050, hop_length=512):
     """
     For each frame in chroma, determine which chord label applies based on annotations.